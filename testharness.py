@@ -1,14 +1,32 @@
-# import matplotlib.pyplot as plt
 import os 
+import sys
 import argparse
 import subprocess
 import json
 import re
-import matplotlib.pyplot as plt
 from string import Template
 from enum import Enum
 import time
 import math
+import random
+import statistics
+import threading
+import hashlib
+import shutil
+import signal
+import socket
+import platform
+import queue
+import sqlite3
+import csv
+import io
+import gzip
+import lzma
+import importlib.metadata
+import numpy as np
+from collections import namedtuple, deque
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 
 class Fields(str, Enum):
   TIME = 'time'
@@ -17,6 +35,13 @@ class Fields(str, Enum):
   FLIPS = 'flips'
   PARAMS = 'params'
   DISTINCT = 'distinct'
+  COMPILE = 'compile'
+  MEMORY = 'memory'
+  USER_CPU = 'user cpu'
+  SYS_CPU = 'sys cpu'
+  DECISIONS = 'decisions'
+  CNF_TIME = 'cnf time'
+  CNF_MEMORY = 'cnf memory'
 
   def __str__(self):
     return self.value
@@ -38,6 +63,8 @@ class Modes(str, Enum):
   EASBKFH = 'eg + sbk + fh + det + be'
   EASBKFHCT = 'eg + sbk + fh + ct + det + be'
 
+  PROBLOG = 'problog'
+
   def __str__(self):
     return self.name
 
@@ -64,266 +91,2493 @@ class Modes(str, Enum):
       Modes.EAFHCT: 'Ea+FHCT',
       Modes.EASBK: 'Ea+SBK',
       Modes.EASBKFH: 'Ea+SBK+FH',
-      Modes.EASBKFHCT: 'Ea+SBK+FHCT'
+      Modes.EASBKFHCT: 'Ea+SBK+FHCT',
+      Modes.PROBLOG: 'ProbLog'
     }
     
     return mapping[m]
 
+MODE_FLAGS = {
+  Modes.NOOPT: [],
+  Modes.DET: ['-determinism'],
+  Modes.FH: ['-determinism', '-local-hoisting', '-branch-elimination'],
+  Modes.FHCT: ['-determinism', '-global-hoisting', '-branch-elimination'],
+  Modes.SBK: ['-determinism', '-sbk-encoding', '-branch-elimination'],
+  Modes.SBKFH: ['-determinism', '-local-hoisting', '-sbk-encoding', '-branch-elimination'],
+  Modes.SBKFHCT: ['-determinism', '-global-hoisting', '-sbk-encoding', '-branch-elimination'],
+  Modes.EA: ['-eager-eval'],
+  Modes.EADET: ['-eager-eval', '-determinism', '-branch-elimination'],
+  Modes.EAFH: ['-eager-eval', '-local-hoisting', '-determinism', '-branch-elimination'],
+  Modes.EAFHCT: ['-eager-eval', '-global-hoisting', '-determinism', '-branch-elimination'],
+  Modes.EASBK: ['-eager-eval', '-sbk-encoding', '-determinism', '-branch-elimination'],
+  Modes.EASBKFH: ['-eager-eval', '-sbk-encoding', '-local-hoisting', '-determinism', '-branch-elimination'],
+  Modes.EASBKFHCT: ['-eager-eval', '-sbk-encoding', '-global-hoisting', '-determinism', '-branch-elimination'],
+  Modes.PROBLOG: []
+}
+
+# every optimization flag of Dice and the short name it goes by in the mode names
+FLAG_NAMES = {
+  '-eager-eval': 'ea',
+  '-sbk-encoding': 'sbk',
+  '-local-hoisting': 'fh',
+  '-global-hoisting': 'fhct',
+  '-determinism': 'det',
+  '-branch-elimination': 'be'
+}
+
+# hoisting is either local or global
+EXCLUSIVE_FLAGS = [{'-local-hoisting', '-global-hoisting'}]
+
 def get_mode_cmd(mode):
-  if mode == Modes.NOOPT:
-    return []
-  if mode == Modes.DET:
-    return ['-determinism']
-  if mode == Modes.FH:
-    return ['-determinism', '-local-hoisting', '-branch-elimination']
-  if mode == Modes.FHCT:
-    return ['-determinism', '-global-hoisting', '-branch-elimination']
-  if mode == Modes.SBK:
-    return ['-determinism', '-sbk-encoding', '-branch-elimination']
-  if mode == Modes.SBKFH:
-    return ['-determinism', '-local-hoisting', '-sbk-encoding', '-branch-elimination']
-  if mode == Modes.SBKFHCT:
-    return ['-determinism', '-global-hoisting', '-sbk-encoding', '-branch-elimination']
-  if mode == Modes.EA:
-    return ['-eager-eval']
-  if mode == Modes.EADET:
-    return ['-eager-eval', '-determinism', '-branch-elimination']
-  if mode == Modes.EAFH:
-    return ['-eager-eval', '-local-hoisting', '-determinism', '-branch-elimination']
-  if mode == Modes.EAFHCT:
-    return ['-eager-eval', '-global-hoisting', '-determinism', '-branch-elimination']
-  if mode == Modes.EASBK:
-    return ['-eager-eval', '-sbk-encoding', '-determinism', '-branch-elimination']
-  if mode == Modes.EASBKFH:
-    return ['-eager-eval', '-sbk-encoding', '-local-hoisting', '-determinism', '-branch-elimination']
-  if mode == Modes.EASBKFHCT:
-    return ['-eager-eval', '-sbk-encoding', '-global-hoisting', '-determinism', '-branch-elimination']
+  if not mode in MODE_FLAGS:
+    return None
+  return list(MODE_FLAGS[mode])
+
+def flag_configs():
+  configs = []
+  for bits in range(1 << len(FLAG_NAMES)):
+    flags = [flag for i, flag in enumerate(FLAG_NAMES) if bits >> i & 1]
+    if not any(exclusive <= set(flags) for exclusive in EXCLUSIVE_FLAGS):
+      configs.append(tuple(flags))
+  return configs
+
+def config_name(flags):
+  return ' + '.join(FLAG_NAMES[flag] for flag in flags) or 'no opts'
+
+def config_mode(flags):
+  for mode, mode_flags in MODE_FLAGS.items():
+    if mode != Modes.PROBLOG and set(mode_flags) == set(flags):
+      return mode
+  return None
+
+ERROR = -1
+
+TIMEOUT = 'timeout'
+
+OOM = 'oom'
+
+CPU_LIMIT = 'cpu-limit'
+
+LIMITS = [OOM, CPU_LIMIT]
+
+KILL_GRACE = 5
+
+def is_value(v):
+  return isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0
+
+def status_of(v):
+  if v == ERROR:
+    return 'error'
+  if v == TIMEOUT:
+    return 'timeout'
+  if v in LIMITS:
+    return v
+  return 'ok'
+
+STATS_FIELDS = [Fields.SIZE, Fields.CALLS, Fields.FLIPS, Fields.PARAMS, Fields.DISTINCT, Fields.DECISIONS]
+
+SAMPLED_FIELDS = [Fields.TIME, Fields.COMPILE, Fields.MEMORY, Fields.USER_CPU, Fields.SYS_CPU, Fields.CNF_TIME, Fields.CNF_MEMORY]
+
+SECONDS_FIELDS = [Fields.TIME, Fields.COMPILE, Fields.USER_CPU, Fields.SYS_CPU, Fields.CNF_TIME]
+
+NO_COMPILE_FIELDS = [Fields.FLIPS, Fields.PARAMS, Fields.DISTINCT]
+
+# measured by compiling to CNF and counting with sharpSAT instead of building the BDD
+CNF_FIELDS = [Fields.CNF_TIME, Fields.CNF_MEMORY, Fields.DECISIONS]
+
+# per-mode records stored next to the fields of a file
+PROBLOG_FIELDS = [Fields.TIME, Fields.MEMORY, Fields.USER_CPU, Fields.SYS_CPU]
+
+BACKEND_EXTRAS = ['rss', 'budget', 'provenance', 'overhead', 'prediction']
+
+# CNF results share the mode key with the BDD ones, so their per job records get keys of their own
+CNF_EXTRA = 'cnf %s'
+
+MODE_EXTRAS = BACKEND_EXTRAS + [CNF_EXTRA % key for key in BACKEND_EXTRAS]
+
+def extra(key, fields):
+  return CNF_EXTRA % key if any(f in CNF_FIELDS for f in fields) else key
+
+OVERHEAD_PARTS = ['spawn', 'wall', 'cpu', 'compile', 'other']
+
+Job = namedtuple('Job', ['filename', 'file', 'mode', 'fields', 'trial', 'flags'], defaults=[0, ()])
+
+Trials = namedtuple('Trials', ['repeat', 'warmup', 'adaptive', 'ci_width', 'max_repeat', 'budget'])
+
+def benchmarks(files, mode):
+  # ProbLog programs are stored under the name of the Dice program of the same benchmark, 
+  # so both land in one row of the results
+  extension = '.pl' if mode == Modes.PROBLOG else '.dice'
+  for filename in sorted(os.listdir(files)):
+    file = os.path.join(files, filename)
+    name, ext = os.path.splitext(filename)
+    if os.path.isfile(file) and ext.lower() == extension:
+      yield name + '.dice', file
+
+def make_jobs(files, fields, modes, results, completed=(), flags=()):
+  if Fields.TIME in fields and not Fields.COMPILE in fields:
+    fields = fields + [Fields.COMPILE]
+  if Fields.USER_CPU in fields and not Fields.SYS_CPU in fields:
+    fields = fields + [Fields.SYS_CPU]
+
+  jobs = []
+  for mode in modes:
+    if get_mode_cmd(mode) is None:
+      print('UNKNOWN MODE:', mode)
+      continue
+
+    mode_fields = [f for f in fields if f in PROBLOG_FIELDS] if mode == Modes.PROBLOG else fields
+    for filename, file in benchmarks(files, mode):
+      file_results = results.setdefault(filename, {})
+      for f in mode_fields:
+        file_results.setdefault(f, {}).setdefault(mode, None)
+
+      missing = tuple(f for f in mode_fields if not (filename, mode, f) in completed)
+      if missing:
+        jobs.append(Job(filename, file, mode, missing, flags=tuple(flags)))
+
+  return sorted(jobs, key=lambda j: (j.filename, modes.index(j.mode)))
+
+def time_field(fields):
+  return Fields.CNF_TIME if any(f in CNF_FIELDS for f in fields) else Fields.TIME
+
+def expected_time(job, results, timeout):
+  if all(f in NO_COMPILE_FIELDS for f in job.fields):
+    return 0
+
+  file_results = results.get(job.filename, {})
+  t = file_results.get(time_field(job.fields), {}).get(job.mode)
+  if isinstance(t, (int, float)) and t > 0:
+    return t
+  t = file_results.get('prediction', {}).get(job.mode, {}).get(Fields.TIME)
+  if t is not None and time_field(job.fields) == Fields.TIME:
+    return min(t, timeout or math.inf)
+  return timeout or math.inf
+
+def mode_cost(mode, results, field=Fields.TIME):
+  times = [r[field][mode] for r in results.values() 
+    if field in r and is_value(r[field].get(mode))]
+  return statistics.median(times) if times else math.inf
+
+def schedule(jobs, results, timeout, policy=None):
+  jobs = sorted(jobs, key=lambda j: expected_time(j, results, timeout), reverse=True)
+  if policy and policy.cheapest_first:
+    costs = {mode: mode_cost(mode, results, time_field(jobs[0].fields)) for mode in {j.mode for j in jobs}}
+    jobs.sort(key=lambda j: costs[j.mode])
+  return jobs
+
+MIN_BUDGET = 1.0
+
+Policy = namedtuple('Policy', ['name', 'k', 'cheapest_first'])
+
+def job_budget(job, results, timeout, policy):
+  budget = {'policy': 'flat', 'seconds': timeout}
+  if policy is None or policy.name == 'flat':
+    return budget
+
+  file_results = results.get(job.filename, {})
+  times = file_results.get(time_field(job.fields), {})
+  if policy.name == 'predicted':
+    predicted = file_results.get('prediction', {}).get(job.mode, {}).get(Fields.TIME)
+    best = [predicted] if predicted is not None and time_field(job.fields) == Fields.TIME else []
+  else:
+    best = [t for t in times.values() if is_value(t) and t > 0]
+  if best:
+    cap = max(policy.k * min(best), MIN_BUDGET)
+    if timeout is None or cap < timeout:
+      budget = {'policy': '%s-%g' % ('pred' if policy.name == 'predicted' else 'par', policy.k), 'seconds': round(cap, 4)}
+
+  # dominance pruning: it timed out before with at least this much time
+  previous = file_results.get(extra('budget', job.fields), {}).get(job.mode)
+  if times.get(job.mode) == TIMEOUT and previous and previous['seconds'] is not None \
+    and budget['seconds'] is not None and previous['seconds'] >= budget['seconds']:
+    return None
+
+  return budget
+
+def get_fields_cmd(fields):
+  if any(f in CNF_FIELDS for f in fields):
+    return ['-cnf', '-show-cnf-decisions']
+
+  cmd = []
+  if Fields.TIME in fields or Fields.COMPILE in fields:
+    cmd.append('-show-time')
+  if Fields.SIZE in fields:
+    cmd.append('-show-size')
+  if Fields.CALLS in fields:
+    cmd.append('-num-recursive-calls')
+
+  if all(f in NO_COMPILE_FIELDS for f in fields):
+    cmd.append('-no-compile')
   
+  if Fields.FLIPS in fields:
+    cmd.append('-show-flip-count')
+  if Fields.PARAMS in fields or Fields.DISTINCT in fields:
+    cmd.append('-show-params')
+
+  return cmd
+
+class Profiler:
+  def __init__(self):
+    self.enabled = False
+    self.started = time.perf_counter()
+    self.totals = {}
+    self.calls = {}
+    self.lock = threading.Lock()
+    self.local = threading.local()
+
+  @contextmanager
+  def phase(self, name):
+    if not self.enabled:
+      yield
+      return
+
+    stack = self.local.__dict__.setdefault('stack', [])
+    # each phase only counts its own time, nested phases are taken out of the parent
+    stack.append(0.0)
+    t1 = time.perf_counter()
+    try:
+      yield
+    finally:
+      elapsed = time.perf_counter() - t1
+      inner = stack.pop()
+      if stack:
+        stack[-1] += elapsed
+      with self.lock:
+        self.totals[name] = self.totals.get(name, 0.0) + elapsed - inner
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+  def wrap(self, name, fn):
+    if not self.enabled:
+      return fn
+
+    def wrapped(*args):
+      with self.phase(name):
+        return fn(*args)
+    return wrapped
+
+  def rows(self):
+    wall = time.perf_counter() - self.started
+    rows = []
+    for name in sorted(self.totals, key=self.totals.get, reverse=True):
+      rows.append([name, str(self.calls[name]), '%.4f' % self.totals[name], '%.1f' % (100 * self.totals[name] / wall)])
+    rows.append(['harness wall', '-', '%.4f' % wall, '100.0'])
+    return rows
+
+profiler = Profiler()
+
+def to_int(s):
+  return int(float(s))
+
+def to_seconds(s):
+  return round(float(s), 4)
+
+DICE_SECTIONS = {
+  'Compilation Time Elapsed': (Fields.COMPILE, to_seconds),
+  'Final compiled BDD size': (Fields.SIZE, to_int),
+  'Number of recursive calls': (Fields.CALLS, to_int),
+  'Number of flips': (Fields.FLIPS, to_int),
+  'Number of Parameters': (Fields.PARAMS, to_int),
+  'Number of Distinct Parameters': (Fields.DISTINCT, to_int),
+}
+
+CNF_SECTIONS = {
+  'Total CNF decisions': (Fields.DECISIONS, to_int),
+}
+
+class SectionParser:
+  header_pattern = re.compile(r'=+\[ (.+?) \]=+$')
+  number_pattern = re.compile(r'[-+]?\d+\.?\d*(?:[eE][-+]?\d+)?')
+
+  def __init__(self, sections=None, keep=50):
+    self.sections = sections or {}
+    self.values = {}
+    self.current = None
+    self.tail = deque(maxlen=keep)
+
+  def feed(self, line):
+    line = line.strip()
+    self.tail.append(line)
+    header = self.header_pattern.match(line)
+    if header:
+      self.current = self.sections.get(header.group(1))
+    elif self.current and line:
+      field, convert = self.current
+      number = self.number_pattern.match(line)
+      if number:
+        self.values[field] = convert(number.group(0))
+      self.current = None
+
+  def output(self):
+    return '\n'.join(self.tail)
+
+def read_lines(stream, consume, limit=1 << 16):
+  for line in iter(lambda: stream.readline(limit), b''):
+    consume(line.decode('utf-8', 'replace'))
+
+Execution = namedtuple('Execution', ['returncode', 'values', 'output', 'error', 'wall', 'rusage', 'rss', 'timed_out', 'spawn', 'limited', 'peak'])
+
+MEMORY_INTERVAL = 0.01
+
+Limits = namedtuple('Limits', ['memory', 'cpu', 'files', 'cgroup', 'pin'])
+
+OOM_PATTERN = re.compile(r'out.of.memory|cannot allocate memory|memoryerror|bad_alloc', re.IGNORECASE)
+
+def read_rss(pid, key='VmRSS:'):
+  try:
+    with open('/proc/%s/status' % pid) as f:
+      for line in f:
+        if line.startswith(key):
+          return int(line.split()[1])
+  except (OSError, ValueError):
+    pass
   return None
 
-def run(file, dice_path, timeout, fields, modes, results):
-  print('========================================')
+running = set()
+running_lock = threading.Lock()
 
-  print('File:', file)
+def signal_group(pgid, sig):
+  try:
+    os.killpg(pgid, sig)
+  except (ProcessLookupError, PermissionError):
+    pass
 
+def kill_running():
+  with running_lock:
+    for pgid in running:
+      signal_group(pgid, signal.SIGKILL)
+
+# filled by reserve_cpus under --pin
+free_cpus = queue.Queue()
+
+def read_first(path, default=None):
+  try:
+    with open(path) as f:
+      return f.readline().strip()
+  except OSError:
+    return default
+
+def physical_cores():
+  # one logical CPU per core, so hyperthread siblings never share a measurement
+  cores = {}
+  cpus = os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else range(os.cpu_count() or 1)
+  for cpu in sorted(cpus):
+    siblings = read_first('/sys/devices/system/cpu/cpu%d/topology/thread_siblings_list' % cpu, str(cpu))
+    cores.setdefault(siblings, cpu)
+  return sorted(cores.values())
+
+def reserve_cpus(n_jobs):
+  # every running child takes a core from free_cpus, so there are never more workers than cores
+  cores = physical_cores()
+  if len(cores) > n_jobs and hasattr(os, 'sched_setaffinity'):
+    workers = cores[1:n_jobs + 1]
+    # the harness keeps the first core for itself, away from every worker
+    os.sched_setaffinity(0, {cores[0]})
+  else:
+    workers = cores
+    if n_jobs > len(cores):
+      print('WARNING: --pin runs %d workers instead of %d, one per core' % (len(cores), n_jobs))
+    print('WARNING: the harness shares a core with the workers')
+
+  while not free_cpus.empty():
+    free_cpus.get()
+  for cpu in workers:
+    free_cpus.put(cpu)
+  return workers
+
+cgroup_ids = iter(range(1 << 62))
+
+def cgroup_available(root):
+  return os.path.isfile(os.path.join(root, 'cgroup.procs')) and os.access(root, os.W_OK)
+
+def make_cgroup(limits):
+  path = os.path.join(limits.cgroup, 'job-%d-%d' % (os.getpid(), next(cgroup_ids)))
+  os.mkdir(path)
+  if limits.memory:
+    with open(os.path.join(path, 'memory.max'), 'w') as f:
+      f.write(str(limits.memory << 20))
+    try:
+      with open(os.path.join(path, 'memory.swap.max'), 'w') as f:
+        f.write('0')
+    except OSError:
+      pass
+  return path
+
+def remove_cgroup(path):
+  oom_kills = 0
+  peak = None
+  try:
+    with open(os.path.join(path, 'memory.events')) as f:
+      for line in f:
+        key, value = line.split()
+        if key == 'oom_kill':
+          oom_kills = int(value)
+    peak = int(read_first(os.path.join(path, 'memory.peak'), 0)) >> 10 or None
+    with open(os.path.join(path, 'cgroup.kill'), 'w') as f:
+      f.write('1')
+  except OSError:
+    pass
+  try:
+    os.rmdir(path)
+  except OSError:
+    pass
+  return oom_kills, peak
+
+def limit_cmd(cmd, limits, cpu=None):
+  # exec wrappers instead of a preexec_fn, which is not safe to run while the worker threads are around. 
+  # Both exec the command in place, so its pid and rusage stay the ones of Dice
+  wrapper = []
+  if cpu is not None:
+    wrapper += ['taskset', '-c', str(cpu)]
+  rlimits = []
+  if limits.memory:
+    rlimits.append('--as=%d' % (limits.memory << 20))
+  if limits.cpu:
+    rlimits.append('--cpu=%d:%d' % (limits.cpu, limits.cpu + KILL_GRACE))
+  if limits.files:
+    rlimits.append('--nofile=%d' % limits.files)
+  if rlimits:
+    wrapper += ['prlimit'] + rlimits + ['--']
+  return wrapper + list(cmd)
+
+def limit_wrappers(limits):
+  needed = []
+  if limits.pin:
+    needed.append('taskset')
+  if limits.memory or limits.cpu or limits.files:
+    needed.append('prlimit')
+  return [w for w in needed if shutil.which(w) is None]
+
+def join_cgroup(cgroup, pid):
+  with open(os.path.join(cgroup, 'cgroup.procs'), 'w') as f:
+    f.write(str(pid))
+
+def tee(*consumers):
+  def consume(line):
+    for c in consumers:
+      c(line)
+  return consume
+
+def execute(cmd, timeout, sections=None, rss_interval=None, limits=None, raw=None, memory=False):
+  cpu = free_cpus.get() if limits and limits.pin else None
+  cgroup = make_cgroup(limits) if limits and limits.cgroup else None
+  if limits:
+    cmd = limit_cmd(cmd, limits, cpu)
+
+  # the child's ru_maxrss starts at the harness's own peak, the memory it shares until exec
+  floor = read_rss('self', 'VmHWM:') or 0
+  t1 = time.perf_counter()
+  p = None
+  try:
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    if cgroup:
+      # from the parent, by pid, before Dice is far enough to start children of its own
+      join_cgroup(cgroup, p.pid)
+  except BaseException:
+    if p:
+      signal_group(p.pid, signal.SIGKILL)
+      p.wait()
+    if cpu is not None:
+      free_cpus.put(cpu)
+    if cgroup:
+      remove_cgroup(cgroup)
+    raise
+  spawn = time.perf_counter() - t1
+  with running_lock:
+    running.add(p.pid)
+  lock = threading.Lock()
+  timed_out = threading.Event()
+  exited = threading.Event()
+
+  def expire():
+    with lock:
+      if p.returncode is not None:
+        return
+      timed_out.set()
+      signal_group(p.pid, signal.SIGTERM)
+    if not exited.wait(KILL_GRACE):
+      with lock:
+        if p.returncode is None:
+          signal_group(p.pid, signal.SIGKILL)
+
+  rss = []
+  def sample():
+    while not exited.wait(rss_interval):
+      kb = read_rss(p.pid)
+      if kb is not None:
+        rss.append([round(time.perf_counter() - t1, 4), kb])
+
+  # Popen returns after exec, so from here on VmHWM is the peak of Dice alone
+  hwm = []
+  def track_peak():
+    while True:
+      kb = read_rss(p.pid, 'VmHWM:')
+      if kb is not None:
+        hwm.append(kb)
+      if exited.wait(MEMORY_INTERVAL):
+        return
+
+  parser = SectionParser(sections)
+  err = deque(maxlen=50)
+  consume_out = profiler.wrap('parse', parser.feed)
+  consume_err = err.append
+  if raw:
+    # the full output goes to the archive, the parser only keeps a tail of it
+    consume_out = tee(consume_out, raw[0].write)
+    consume_err = tee(consume_err, raw[1].write)
+  threads = [threading.Thread(target=read_lines, args=(p.stderr, consume_err))]
+  if rss_interval:
+    threads.append(threading.Thread(target=sample))
+  if memory:
+    threads.append(threading.Thread(target=track_peak))
+  for t in threads:
+    t.daemon = True
+    t.start()
+
+  timer = threading.Timer(timeout, expire) if timeout else None
+  if timer:
+    timer.start()
+
+  read_lines(p.stdout, consume_out)
+  reaped = None
+  if hasattr(os, 'waitid'):
+    os.waitid(os.P_PID, p.pid, os.WEXITED | os.WNOWAIT)
+  else:
+    # no waitid on macOS, so reap outside the lock and accept a short window in which expire() may signal a reused pid
+    reaped = os.wait4(p.pid, 0)
+  with lock:
+    _, status, rusage = reaped or os.wait4(p.pid, 0)
+    p.returncode = os.waitstatus_to_exitcode(status)
+    # take down anything the child left behind, e.g. sharpSAT under -cnf
+    if timed_out.is_set() or p.returncode < 0:
+      signal_group(p.pid, signal.SIGKILL)
+  t2 = time.perf_counter()
+
+  if cpu is not None:
+    free_cpus.put(cpu)
+  oom_kills, peak = remove_cgroup(cgroup) if cgroup else (0, None)
+  if peak is None and memory:
+    # above the harness's peak ru_maxrss is Dice's own, including children like sharpSAT. 
+    # Below it only the sampled high-water mark tells, which misses growth in the last few ms
+    maxrss = rusage.ru_maxrss >> 10 if sys.platform == 'darwin' else rusage.ru_maxrss
+    peak = maxrss if maxrss > floor else max(hwm, default=None)
+
+  exited.set()
+  with running_lock:
+    running.discard(p.pid)
+  if timer:
+    timer.cancel()
+  for t in threads:
+    t.join()
+  p.stdout.close()
+  p.stderr.close()
+
+  error = ''.join(err)
+  limited = None
+  if limits and p.returncode != 0 and not timed_out.is_set():
+    if oom_kills or limits.memory and OOM_PATTERN.search(error + parser.output()):
+      limited = OOM
+    elif limits.cpu and (p.returncode == -signal.SIGXCPU or p.returncode == -signal.SIGKILL 
+      and rusage.ru_utime + rusage.ru_stime >= limits.cpu):
+      limited = CPU_LIMIT
+
+  return Execution(p.returncode, parser.values, parser.output(), error, 
+    t2 - t1, rusage, rss, timed_out.is_set(), spawn, limited, peak)
+
+def usage_values(execution, fields):
+  values = {}
   if Fields.TIME in fields:
-    print('Measuring time elapsed...')
-    for mode in modes:
-      cmd = get_mode_cmd(mode)
-      if cmd is None:
-        print('UNKNOWN MODE')
+    values[Fields.TIME] = round(execution.wall, 4)
+  if Fields.CNF_TIME in fields:
+    values[Fields.CNF_TIME] = round(execution.wall, 4)
+  # a run too short to sample under the harness's own peak leaves memory unknown
+  if Fields.MEMORY in fields and execution.peak is not None:
+    values[Fields.MEMORY] = execution.peak
+  if Fields.CNF_MEMORY in fields and execution.peak is not None:
+    values[Fields.CNF_MEMORY] = execution.peak
+  if Fields.USER_CPU in fields:
+    values[Fields.USER_CPU] = round(execution.rusage.ru_utime, 4)
+  if Fields.SYS_CPU in fields:
+    values[Fields.SYS_CPU] = round(execution.rusage.ru_stime, 4)
+  return values
+
+def overhead_of(execution):
+  cpu = execution.rusage.ru_utime + execution.rusage.ru_stime
+  compile = execution.values.get(Fields.COMPILE)
+  return {
+    'spawn': round(execution.spawn, 4),
+    'wall': round(execution.wall, 4),
+    'cpu': round(cpu, 4),
+    'compile': compile,
+    # whatever Dice does not report as compilation: runtime startup, parsing, output and our own pipes
+    'other': round(execution.wall - compile, 4) if compile is not None else None
+  }
+
+def run(job, dice_path, timeout, rss_interval=None, limits=None, archive=None):
+  if job.mode == Modes.PROBLOG:
+    cmd = ['problog', job.file]
+  else:
+    cmd = [dice_path, job.file, '-skip-table'] + get_fields_cmd(job.fields) + list(job.flags) + get_mode_cmd(job.mode)
+
+  sections = CNF_SECTIONS if any(f in CNF_FIELDS for f in job.fields) else DICE_SECTIONS
+  with archive.writer(job) if archive else nullcontext() as raw:
+    execution = execute(cmd, timeout, sections, rss_interval, limits, raw, 
+      memory=Fields.MEMORY in job.fields or Fields.CNF_MEMORY in job.fields)
+    values = execution_values(job, execution, rss_interval)
+    if raw and any(status_of(values[f]) != 'ok' for f in job.fields):
+      # a failed run must not replace the output of a good one
+      raw.clear()
+  return values
+
+def execution_values(job, execution, rss_interval):
+  if execution.timed_out:
+    return {f:TIMEOUT for f in job.fields}
+  if execution.limited:
+    return {f:execution.limited for f in job.fields}
+
+  values = usage_values(execution, job.fields)
+  values.update((f, v) for f, v in execution.values.items() if f in job.fields)
+
+  if execution.returncode != 0 or any(f in job.fields and not f in values for f in STATS_FIELDS):
+    values = {f:ERROR for f in job.fields}
+    print('ERROR:')
+    print(execution.output)
+  else:
+    if rss_interval:
+      values['rss'] = execution.rss
+    if Fields.TIME in job.fields:
+      values['overhead'] = overhead_of(execution)
+
+  return values
+
+def bootstrap_ci(samples, confidence=0.95, resamples=1000):
+  if len(samples) < 2:
+    return [samples[0], samples[0]]
+
+  rng = random.Random(0)
+  medians = sorted(statistics.median(rng.choices(samples, k=len(samples))) for _ in range(resamples))
+  lo = medians[int((1 - confidence) / 2 * resamples)]
+  hi = medians[int((1 + confidence) / 2 * resamples) - 1]
+  return [lo, hi]
+
+def summarize_samples(samples):
+  lo, hi = bootstrap_ci(samples)
+  return {
+    'n': len(samples),
+    'median': round(statistics.median(samples), 4),
+    'min': round(min(samples), 4),
+    'ci': [round(lo, 4), round(hi, 4)]
+  }
+
+def u_counts(n1, n2):
+  # number of orderings of n1 + n2 distinct values giving each Mann-Whitney U
+  prev = [[1] for _ in range(n2 + 1)]
+  for i in range(1, n1 + 1):
+    row = [[1]]
+    for j in range(1, n2 + 1):
+      counts = [0] * (i * j + 1)
+      for u, c in enumerate(prev[j]):
+        counts[u + j] += c
+      for u, c in enumerate(row[j - 1]):
+        counts[u] += c
+      row.append(counts)
+    prev = row
+  return prev[n2]
+
+def rank_sum_p(a, b):
+  n1, n2 = len(a), len(b)
+  if not n1 or not n2:
+    return 1.0
+
+  pooled = sorted(a + b)
+  ranks = {}
+  i = 0
+  while i < len(pooled):
+    j = i
+    while j < len(pooled) and pooled[j] == pooled[i]:
+      j += 1
+    ranks[pooled[i]] = (i + j + 1) / 2
+    i = j
+  u = sum(ranks[x] for x in a) - n1 * (n1 + 1) / 2
+
+  if len(ranks) == len(pooled) and n1 + n2 <= 50:
+    counts = u_counts(n1, n2)
+    total = math.comb(n1 + n2, n1)
+    lower = sum(counts[:int(u) + 1]) / total
+    upper = sum(counts[int(u):]) / total
+    return min(1.0, 2 * min(lower, upper))
+
+  # normal approximation with tie correction
+  n = n1 + n2
+  ties = sum(t ** 3 - t for t in (pooled.count(x) for x in ranks))
+  sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+  if sigma == 0:
+    return 1.0
+  z = max(abs(u - n1 * n2 / 2) - 0.5, 0) / sigma
+  return math.erfc(z / math.sqrt(2))
+
+def converged(samples, trials):
+  if len(samples) >= trials.max_repeat:
+    return True
+  if trials.budget is not None and sum(samples) >= trials.budget:
+    return True
+  if len(samples) < 3:
+    return False
+
+  lo, hi = bootstrap_ci(samples)
+  return (hi - lo) / 2 <= trials.ci_width * statistics.median(samples)
+
+def expand_trials(jobs, results, timeout, trials, policy=None):
+  if trials.repeat == 1 and trials.warmup == 0:
+    return schedule(jobs, results, timeout, policy)
+
+  costs = {mode: mode_cost(mode, results, time_field(jobs[0].fields)) for mode in {j.mode for j in jobs}}
+  rounds = []
+  for trial in range(trials.warmup + trials.repeat):
+    round_jobs = [job._replace(trial=trial) for job in jobs]
+    random.shuffle(round_jobs)
+    if policy and policy.cheapest_first:
+      round_jobs.sort(key=lambda j: costs[j.mode])
+    rounds += round_jobs
+  return rounds
+
+def finalize(job, state, results):
+  file_results = results[job.filename]
+  for f, v in state['values'].items():
+    file_results.setdefault(f, {})[job.mode] = v
+
+  for f, samples in state['samples'].items():
+    if samples:
+      median = statistics.median(samples)
+      # a single run has nothing to add over its value
+      for key, value in [('samples', samples), ('stats', summarize_samples(samples))]:
+        if len(samples) > 1:
+          file_results.setdefault(key, {}).setdefault(f, {})[job.mode] = value
+        else:
+          file_results.get(key, {}).get(f, {}).pop(job.mode, None)
+      file_results.setdefault(f, {})[job.mode] = round(median, 4) if f in SECONDS_FIELDS else int(round(median))
+
+  if state['rss']:
+    file_results.setdefault(extra('rss', job.fields), {})[job.mode] = state['rss']
+  if state['overhead']:
+    file_results.setdefault(extra('overhead', job.fields), {})[job.mode] = {part: round(statistics.median(o[part] for o in state['overhead']), 4) 
+      if all(o[part] is not None for o in state['overhead']) else None for part in OVERHEAD_PARTS}
+  if state['budget']:
+    file_results.setdefault(extra('budget', job.fields), {})[job.mode] = state['budget']
+
+  return ', '.join('%s=%s' % (f, file_results[f][job.mode]) for f in job.fields)
+
+def stamp(job, results, cache=None):
+  machine = machine_info()
+  load = os.getloadavg()[0]
+  with running_lock:
+    own = len(running)
+  results[job.filename].setdefault(extra('provenance', job.fields), {})[job.mode] = {
+    'timestamp': time.time(),
+    'host': socket.gethostname(),
+    'machine': machine['id'],
+    'load': round(load, 2),
+    # the sweep's own runs count towards the load, only other work makes the machine loaded
+    'loaded': load - own > machine['cores'],
+    'key': cache.key(job) if cache else None,
+    'dice': cache.tool_hash(job) if cache else None
+  }
+
+def save_json(path, data):
+  # unique name so concurrent writers, e.g. shards sharing a cache, never clash
+  tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+  with profiler.phase('json'):
+    with open(tmp, 'w') as f:
+      json.dump(data, f, indent=4)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_json(path):
+  with profiler.phase('json'):
+    with open(path) as f:
+      return json.load(f)
+
+def load_data(path):
+  data = load_json(path)
+  if not 'hosts' in data:
+    # written before hosts were recorded, when a timed out run left its time as null under the recorded timeout
+    for file_results in data.get('results', {}).values():
+      times = file_results.get(Fields.TIME, {})
+      for m, value in times.items():
+        if value is None and data.get('timeouts', {}).get(m) is not None:
+          times[m] = TIMEOUT
+  return data
+
+def apply_entry(results, entry):
+  file_results = results.setdefault(entry['file'], {})
+  field, mode = entry['field'], entry['mode']
+  if field in MODE_EXTRAS:
+    file_results.setdefault(field, {})[mode] = entry['value']
+    return
+
+  file_results.setdefault(field, {})[mode] = entry['value']
+  for key in ['samples', 'stats']:
+    if key in entry:
+      file_results.setdefault(key, {}).setdefault(field, {})[mode] = entry[key]
+
+def job_entries(results, filename, mode, fields):
+  file_results = results[filename]
+  entries = []
+  for f in fields:
+    value = file_results[f][mode]
+    entry = {'file': filename, 'mode': mode, 'field': f, 'value': value, 'status': status_of(value)}
+    for key in ['samples', 'stats']:
+      if f in file_results.get(key, {}) and mode in file_results[key][f]:
+        entry[key] = file_results[key][f][mode]
+    entries.append(entry)
+
+  for key in (extra(key, fields) for key in BACKEND_EXTRAS):
+    if mode in file_results.get(key, {}):
+      entries.append({'file': filename, 'mode': mode, 'field': key, 'value': file_results[key][mode], 'status': 'ok'})
+
+  return entries
+
+def hash_file(path, hashes={}):
+  st = os.stat(path)
+  key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+  if not key in hashes:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+      for chunk in iter(lambda: f.read(1 << 20), b''):
+        h.update(chunk)
+    hashes[key] = h.hexdigest()
+  return hashes[key]
+
+class Cache:
+  def __init__(self, path, dice_path):
+    self.path = path
+    dice = dice_path if os.path.isfile(dice_path) else shutil.which(dice_path)
+    self.dice_hash = hash_file(dice) if dice else None
+    self.problog = shutil.which('problog')
+    self.problog_hash = None
+    # a lookup that failed is not tried again, problog --version can take a while to give up
+    self.problog_checked = False
+
+  def problog_version(self):
+    # the console script is the same across releases, so the version is what tells them apart
+    try:
+      p = subprocess.run([self.problog, '--version'], capture_output=True, text=True, timeout=60)
+      if p.returncode == 0 and p.stdout.strip():
+        return p.stdout.strip()
+    except (OSError, subprocess.TimeoutExpired):
+      pass
+    try:
+      return importlib.metadata.version('problog')
+    except importlib.metadata.PackageNotFoundError:
+      return None
+
+  def tool_hash(self, job):
+    if job.mode == Modes.PROBLOG:
+      if self.problog and not self.problog_checked:
+        self.problog_checked = True
+        version = self.problog_version()
+        if version:
+          self.problog_hash = hashlib.sha256(('problog %s' % version).encode()).hexdigest()
+      return self.problog_hash
+    return self.dice_hash
+
+  def key(self, job):
+    if self.tool_hash(job) is None:
+      return None
+    inputs = {
+      'dice': self.tool_hash(job),
+      'program': hash_file(job.file),
+      'mode': get_mode_cmd(job.mode),
+      'fields': get_fields_cmd(job.fields)
+    }
+    if job.flags:
+      inputs['flags'] = list(job.flags)
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+  def entry_path(self, key):
+    return os.path.join(self.path, key[:2], key + '.json')
+
+  def load(self, job, repeat=1):
+    key = self.key(job)
+    if key is None or not os.path.exists(self.entry_path(key)):
+      return None
+    entries = load_json(self.entry_path(key))
+
+    fields = {e['field'] for e in entries}
+    if any(not f in fields for f in job.fields):
+      return None
+    if any(len(e.get('samples', [e['value']])) < repeat for e in entries if e['field'] in SAMPLED_FIELDS):
+      return None
+    return [dict(e, file=job.filename, mode=job.mode) for e in entries]
+
+  def store(self, job, entries):
+    key = self.key(job)
+    if key is None or not self.path or any(e['status'] != 'ok' for e in entries):
+      return
+    os.makedirs(os.path.dirname(self.entry_path(key)), exist_ok=True)
+    save_json(self.entry_path(key), entries)
+
+ARCHIVE_OPENERS = {'gz': gzip.open, 'xz': lzma.open}
+
+class Archive:
+  # raw Dice output next to the cache, under the same job key, so new fields can be parsed without running again
+  def __init__(self, path, compression='gz', cache=None):
+    self.path = path
+    self.compression = compression
+    self.cache = cache
+
+  def entry_path(self, key, stream, compression=None):
+    return os.path.join(self.path, key[:2], '%s.%s.%s' % (key, stream, compression or self.compression))
+
+  @contextmanager
+  def writer(self, job):
+    key = self.cache.key(job)
+    if key is None:
+      yield None
+      return
+
+    paths = [self.entry_path(key, stream) for stream in ['out', 'err']]
+    os.makedirs(os.path.dirname(paths[0]), exist_ok=True)
+    # trials of one job may run at once, the last one to finish wins
+    temps = ['%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident()) for path in paths]
+    files = [ARCHIVE_OPENERS[self.compression](temp, 'wt', encoding='utf-8') for temp in temps]
+    kept = list(files)
+    try:
+      # emptying the list drops the output instead of publishing it
+      yield kept
+    except BaseException:
+      kept.clear()
+      raise
+    finally:
+      for f, temp, path in zip(files, temps, paths):
+        f.close()
+        if kept:
+          os.replace(temp, path)
+        else:
+          os.remove(temp)
+
+  def find(self, key, stream='out'):
+    for compression in ARCHIVE_OPENERS:
+      path = self.entry_path(key, stream, compression)
+      if os.path.exists(path):
+        return path
+    return None
+
+  def lines(self, path):
+    with ARCHIVE_OPENERS[path.rsplit('.', 1)[1]](path, 'rt', encoding='utf-8') as f:
+      yield from f
+
+def reparse(results, archive, fields):
+  parsed, missing = 0, 0
+  for filename, file_results in results.items():
+    for cnf, all_sections in [(False, DICE_SECTIONS), (True, CNF_SECTIONS)]:
+      sections = {name: section for name, section in all_sections.items() if section[0] in fields}
+      backend_fields = [f for f in Fields if (f in CNF_FIELDS) == cnf]
+      for mode, provenance in file_results.get(extra('provenance', backend_fields), {}).items():
+        values = [file_results[f].get(mode) for f in backend_fields if f in file_results]
+        if not sections or not provenance.get('key') or any(v is not None and status_of(v) != 'ok' for v in values):
+          continue
+        path = archive.find(provenance['key'])
+        if path is None:
+          missing += 1
+          continue
+
+        parser = SectionParser(sections, keep=0)
+        for line in archive.lines(path):
+          parser.feed(line)
+        for f, v in parser.values.items():
+          # only backfill, a measured value, e.g. the median compile time over trials, beats the one archived run
+          if file_results.setdefault(f, {}).get(mode) is None:
+            file_results[f][mode] = v
+            parsed += 1
+  return parsed, missing
+
+def from_cache(jobs, cache, results, journal, repeat=1):
+  remaining = []
+  for job in jobs:
+    entries = cache.load(job, repeat)
+    if entries is None:
+      remaining.append(job)
+      continue
+    for entry in entries:
+      apply_entry(results, entry)
+      journal.append(entry)
+    print('[cached] %s %s:' % (job.filename, job.mode), 
+      ', '.join('%s=%s' % (e['field'], e['value']) for e in entries if e['field'] in job.fields))
+  return remaining
+
+class Journal:
+  def __init__(self, path, out, data, resume=False, interval=60, store=None, timeout=None, repeat=1):
+    self.path = path
+    self.store = store
+    self.out = out
+    self.data = data
+    self.interval = interval
+    self.completed = set()
+
+    if resume and os.path.exists(path):
+      limited = set()
+      budgets = {}
+      with open(path) as f:
+        for line in f:
+          try:
+            entry = json.loads(line)
+          except json.JSONDecodeError:
+            # a torn last line from a crash mid-write
+            continue
+          apply_entry(data['results'], entry)
+          key = (entry['file'], entry['mode'], entry['field'])
+          if entry['field'] in MODE_EXTRAS:
+            budgets[key] = entry['value']
+            continue
+          limited.discard(key)
+          # an interrupted job is journaled with the samples it got, it only counts once it has them all, like in Cache.load
+          samples = entry.get('samples', [entry['value']])
+          if entry['status'] == 'ok' and (not entry['field'] in SAMPLED_FIELDS or entry['value'] is None or len(samples) >= repeat):
+            self.completed.add(key)
+          else:
+            self.completed.discard(key)
+            if not entry['status'] in ['ok', 'error']:
+              limited.add(key)
+
+      # a timeout or limit is final if it had at least the time it would get now, only errors run again
+      for filename, mode, field in limited:
+        budget = budgets.get((filename, mode, extra('budget', [field])))
+        if budget and (budget['seconds'] is None or timeout is not None and budget['seconds'] >= timeout):
+          self.completed.add((filename, mode, field))
+
+    # without a path, e.g. from run_matrix, nothing is written and results only live in memory
+    self.f = open(path, 'a' if resume else 'w') if path else None
+    self.saved = time.time()
+
+  def append(self, entry):
+    entry = dict(entry, timestamp=time.time())
+    if self.f:
+      with profiler.phase('journal'):
+        self.f.write(json.dumps(entry) + '\n')
+        self.f.flush()
+        os.fsync(self.f.fileno())
+    if entry['status'] == 'ok':
+      self.completed.add((entry['file'], entry['mode'], entry['field']))
+    if self.store:
+      self.store.insert([entry])
+
+  def record(self, results, filename, mode, fields):
+    for entry in job_entries(results, filename, mode, fields):
+      self.append(entry)
+
+    if time.time() - self.saved >= self.interval:
+      self.save()
+
+  def save(self):
+    if self.out:
+      save_json(self.out, self.data)
+    self.saved = time.time()
+
+  def close(self):
+    self.save()
+    if self.f:
+      self.f.close()
+    if self.store:
+      self.store.set_timeouts(self.data['timeouts'])
+
+def format_duration(seconds):
+  if seconds is None:
+    return '?'
+  seconds = int(seconds)
+  return '%d:%02d:%02d' % (seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+class Events:
+  def __init__(self, path=None, metrics=None, live=False, interval=10):
+    self.f = open(path, 'a') if path else None
+    self.metrics = metrics
+    self.live = live
+    self.interval = interval
+    self.lock = threading.Lock()
+    self.started = time.time()
+    self.total = 0
+    self.done = 0
+    self.statuses = {}
+    self.running = {}
+    self.remaining = {}
+    self.busy = 0.0
+    self.trials = 0
+    self.workers = 1
+    self.stop = threading.Event()
+    self.thread = None
+
+  def emit(self, kind, job=None, **fields):
+    if not self.f:
+      return
+    event = {'event': kind, 'timestamp': time.time()}
+    if job:
+      event.update(file=job.filename, mode=job.mode, trial=job.trial)
+    event.update(fields)
+    with self.lock:
+      self.f.write(json.dumps(event) + '\n')
+      self.f.flush()
+
+  def begin(self, jobs, trials, n_jobs, results, timeout):
+    with self.lock:
+      self.total += len(jobs)
+      self.workers = n_jobs
+      for job in trials:
+        # only times known from earlier runs or predictions, the rest go by the mean so far
+        expected = expected_time(job, results, timeout)
+        if not math.isfinite(expected) or timeout and expected >= timeout:
+          expected = None
+        self.remaining.setdefault((job.filename, job.mode), [expected, 0])[1] += 1
+    for job in trials:
+      self.emit('queued', job, expected=self.remaining[(job.filename, job.mode)][0])
+
+    if (self.live or self.metrics) and not self.thread:
+      self.thread = threading.Thread(target=self.loop)
+      self.thread.daemon = True
+      self.thread.start()
+
+  def queued(self, job):
+    with self.lock:
+      self.remaining[(job.filename, job.mode)][1] += 1
+    self.emit('queued', job, expected=self.remaining[(job.filename, job.mode)][0])
+
+  def started_trial(self, job, budget):
+    with self.lock:
+      self.running[(job.filename, job.mode, job.trial)] = (job, time.time())
+    self.emit('started', job, budget=budget)
+
+  def finished_trial(self, job, values):
+    with self.lock:
+      _, start = self.running.pop((job.filename, job.mode, job.trial))
+      seconds = time.time() - start
+      self.busy += seconds
+      self.trials += 1
+      if (job.filename, job.mode) in self.remaining:
+        self.remaining[(job.filename, job.mode)][1] -= 1
+    status = status_of(next(iter(values.values())))
+    self.emit('finished' if status == 'ok' else status, job, seconds=round(seconds, 4), 
+      values={str(f): values[f] for f in job.fields if f in values})
+
+  def job_done(self, job, status):
+    with self.lock:
+      self.done += 1
+      self.statuses[status] = self.statuses.get(status, 0) + 1
+      self.remaining.pop((job.filename, job.mode), None)
+    self.emit('done', job, status=status)
+
+  def snapshot(self):
+    now = time.time()
+    with self.lock:
+      elapsed = max(now - self.started, 1e-9)
+      running = [(now - start, job) for job, start in self.running.values()]
+      busy = self.busy + sum(seconds for seconds, _ in running)
+      mean = self.busy / self.trials if self.trials else None
+      left = 0.0
+      for expected, trials in self.remaining.values():
+        per = expected if expected is not None else mean
+        if per is None:
+          left = None
+          break
+        left += per * trials
+      if left is not None:
+        left = max(left - sum(seconds for seconds, _ in running), 0) / self.workers
+      return {
+        'total': self.total,
+        'done': self.done,
+        'statuses': dict(self.statuses),
+        'running': len(running),
+        'workers': self.workers,
+        'jobs per hour': self.done / elapsed * 3600,
+        'eta': left,
+        'utilization': busy / (elapsed * self.workers),
+        'longest': max(running, key=lambda r: r[0]) if running else None
+      }
+
+  def status_line(self):
+    s = self.snapshot()
+    line = '%d/%d jobs | %.1f jobs/h | ETA %s | %d/%d busy, %.0f%% utilization' % (s['done'], s['total'], 
+      s['jobs per hour'], format_duration(s['eta']), s['running'], s['workers'], 100 * s['utilization'])
+    if s['longest']:
+      seconds, job = s['longest']
+      line += ' | longest %s %s %ds' % (job.filename, job.mode, seconds)
+    return line
+
+  def write_metrics(self):
+    s = self.snapshot()
+    lines = [
+      '# HELP dice_harness_jobs Jobs of the sweep.',
+      '# TYPE dice_harness_jobs gauge',
+      'dice_harness_jobs %d' % s['total'],
+      '# HELP dice_harness_jobs_done Finished jobs by status.',
+      '# TYPE dice_harness_jobs_done counter'
+    ]
+    lines += ['dice_harness_jobs_done{status="%s"} %d' % (status, n) for status, n in sorted(s['statuses'].items())]
+    for name, value, help in [
+      ('running', s['running'], 'Dice processes running now.'),
+      ('workers', s['workers'], 'Worker slots.'),
+      ('utilization', s['utilization'], 'Share of worker time spent running Dice.'),
+      ('jobs_per_hour', s['jobs per hour'], 'Finished jobs per hour since the start.'),
+      ('eta_seconds', s['eta'] if s['eta'] is not None else float('nan'), 'Estimated seconds until the sweep is done.'),
+      ('longest_running_seconds', s['longest'][0] if s['longest'] else 0, 'Age of the oldest running Dice process.')
+    ]:
+      lines += ['# HELP dice_harness_%s %s' % (name, help), '# TYPE dice_harness_%s gauge' % name, 'dice_harness_%s %g' % (name, value)]
+
+    tmp = '%s.%d.tmp' % (self.metrics, os.getpid())
+    with open(tmp, 'w') as f:
+      f.write('\n'.join(lines) + '\n')
+    os.replace(tmp, self.metrics)
+
+  def draw(self):
+    sys.stderr.write('\r\x1b[K' + self.status_line())
+    sys.stderr.flush()
+
+  def loop(self):
+    written = 0
+    while not self.stop.wait(1):
+      if self.live:
+        self.draw()
+      if self.metrics and time.time() - written >= self.interval:
+        self.write_metrics()
+        written = time.time()
+
+  def print(self, *args):
+    if self.live:
+      sys.stderr.write('\r\x1b[K')
+      sys.stderr.flush()
+    print(*args)
+
+  def close(self):
+    self.stop.set()
+    if self.thread:
+      self.thread.join()
+    if self.metrics:
+      self.write_metrics()
+    if self.live:
+      self.draw()
+      sys.stderr.write('\n')
+    if self.f:
+      self.f.close()
+
+class Store:
+  def __init__(self, path, dice_hash=None):
+    self.dice_hash = dice_hash
+    self.db = sqlite3.connect(path)
+    self.db.execute('PRAGMA journal_mode=WAL')
+    self.db.executescript('''
+      CREATE TABLE IF NOT EXISTS measurements (
+        file TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        field TEXT NOT NULL,
+        value REAL,
+        status TEXT NOT NULL,
+        timestamp REAL NOT NULL,
+        dice TEXT
+      );
+      CREATE INDEX IF NOT EXISTS measurements_key ON measurements (field, mode, file, timestamp);
+      CREATE TABLE IF NOT EXISTS timeouts (mode TEXT PRIMARY KEY, seconds REAL);
+    ''')
+
+  def insert(self, entries, commit=True):
+    rows = []
+    for e in entries:
+      if e['field'] in MODE_EXTRAS:
         continue
+      value = e['value'] if is_value(e['value']) or e['value'] == ERROR else None
+      dice = e.get('dice', self.dice_hash)
+      rows.append((e['file'], e['mode'], e['field'], value, e['status'], e.get('timestamp') or time.time(), dice))
+    self.db.executemany('INSERT INTO measurements VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+    if commit:
+      self.db.commit()
+
+  def set_timeouts(self, timeouts):
+    self.db.executemany('INSERT OR REPLACE INTO timeouts VALUES (?, ?)', list(timeouts.items()))
+    self.db.commit()
+
+  def timeouts(self):
+    return dict(self.db.execute('SELECT mode, seconds FROM timeouts'))
+
+  def query(self, fields=None, modes=None, files=None, dice=None, latest=True):
+    where, params = [], []
+    for column, values in [('field', fields), ('mode', modes), ('file', files)]:
+      if values is not None:
+        values = list(values)
+        where.append('%s IN (%s)' % (column, ', '.join('?' * len(values))))
+        params += values
+    if dice is not None:
+      where.append('dice = ?')
+      params.append(dice)
+
+    sql = 'SELECT file, mode, field, value, status, %s, dice FROM measurements' % ('MAX(timestamp)' if latest else 'timestamp')
+    if where:
+      sql += ' WHERE ' + ' AND '.join(where)
+    if latest:
+      # SQLite takes the bare columns from the row holding the maximum
+      sql += ' GROUP BY file, mode, field'
+    return self.db.execute(sql, params).fetchall()
+
+  def results(self, fields=None, modes=None, files=None, dice=None):
+    results = {}
+    for file, mode, field, value, status, timestamp, _ in self.query(fields, modes, files, dice):
+      if status == 'timeout':
+        value = TIMEOUT
+      elif status in LIMITS:
+        value = status
+      elif value is not None and not field in SECONDS_FIELDS:
+        value = int(value)
+      results.setdefault(file, {}).setdefault(field, {})[mode] = value
+    return results
+
+  def import_json(self, data):
+    for filename, file_results in data.get('results', {}).items():
+      for f in Fields:
+        provenance = file_results.get(extra('provenance', [f]), {})
+        for mode, value in file_results.get(f, {}).items():
+          if value is None:
+            continue
+          entry = {'file': filename, 'mode': mode, 'field': f.value, 'value': value, 'status': status_of(value)}
+          if mode in provenance:
+            entry['timestamp'] = provenance[mode]['timestamp']
+            entry['dice'] = provenance[mode]['dice']
+          self.insert([entry], commit=False)
+    self.db.commit()
+    self.set_timeouts(data.get('timeouts', {}))
+
+  def export_json(self):
+    return {'timeouts': self.timeouts(), 'results': self.results()}
+
+  def close(self):
+    self.db.close()
+
+def parse_shard(s):
+  try:
+    i, n = map(int, s.split('/'))
+  except ValueError:
+    raise argparse.ArgumentTypeError('shard must look like i/n')
+  if n < 1 or not 1 <= i <= n:
+    raise argparse.ArgumentTypeError('shard index must be between 1 and n')
+  return (i, n)
+
+def in_shard(job, shard):
+  i, n = shard
+  digest = hashlib.sha256(('%s\0%s' % (job.filename, job.mode.value)).encode()).hexdigest()
+  return int(digest, 16) % n == i - 1
+
+def cpu_model():
+  try:
+    with open('/proc/cpuinfo') as f:
+      for line in f:
+        if line.startswith('model name'):
+          return line.split(':', 1)[1].strip()
+  except OSError:
+    pass
+  return platform.processor() or None
+
+def machine_info(cache={}):
+  if not cache:
+    memory = None
+    try:
+      with open('/proc/meminfo') as f:
+        memory = int(f.readline().split()[1])
+    except (OSError, ValueError, IndexError):
+      pass
+    cache.update({
+      'cpu': cpu_model(),
+      'cores': len(physical_cores()),
+      'cpus': os.cpu_count(),
+      'memory': memory,
+      'kernel': platform.release(),
+      'platform': platform.platform(),
+      'governor': read_first('/sys/devices/system/cpu/cpu0/cpufreq/scaling_governor')
+    })
+    cache['id'] = hashlib.sha256(json.dumps(cache, sort_keys=True).encode()).hexdigest()[:12]
+  return dict(cache)
+
+def timing_warnings(n_jobs):
+  machine = machine_info()
+  warnings = []
+  load = os.getloadavg()[0]
+  if load + n_jobs > machine['cores']:
+    warnings.append('load average %.2f plus %d workers oversubscribes %d cores' % (load, n_jobs, machine['cores']))
+  if machine['governor'] and machine['governor'] != 'performance':
+    warnings.append('CPU frequency governor is %s, not performance' % machine['governor'])
+  return warnings
+
+def host_info(dice_hash=None, shard=None):
+  return dict(machine_info(), **{
+    'python': platform.python_version(),
+    'dice': dice_hash,
+    'shard': '%d/%d' % shard if shard else None,
+    'load': os.getloadavg(),
+    'timestamp': time.time()
+  })
+
+def comparability(results, modes):
+  machines = {}
+  loaded = 0
+  for file_results in results.values():
+    for key in ['provenance', CNF_EXTRA % 'provenance']:
+      for m in modes:
+        provenance = file_results.get(key, {}).get(m)
+        if provenance:
+          machine = provenance.get('machine')
+          machines[machine] = machines.get(machine, 0) + 1
+          loaded += provenance.get('loaded', False)
+
+  warnings = []
+  if len(machines) > 1:
+    warnings.append('results come from %d machines (%s), their times are not comparable' % (len(machines), 
+      ', '.join('%s: %d' % (machine or 'unknown', n) for machine, n in sorted(machines.items(), key=lambda m: -m[1]))))
+  if loaded:
+    warnings.append('%d results were measured while the load exceeded the cores' % loaded)
+  return warnings
+
+def result_modes(file_results):
+  modes = set()
+  for f in Fields:
+    modes.update(file_results.get(f, {}).keys())
+  return modes
+
+def present_modes(results):
+  modes = set().union(*map(result_modes, results.values()))
+  return [m for m in Modes if m in modes]
+
+def merge_results(datas, by='timestamp', dice_hash=None):
+  def rank(entries):
+    provenance = next((e['value'] for e in entries if e['field'] in ['provenance', CNF_EXTRA % 'provenance']), {})
+    preferred = by == 'key' and dice_hash is not None and provenance.get('dice') == dice_hash
+    return (preferred, provenance.get('timestamp') or 0)
+
+  merged = {'timeouts': {}, 'results': {}, 'hosts': {}}
+  chosen = {}
+  for data in datas:
+    for m, t in data.get('timeouts', {}).items():
+      if merged['timeouts'].get(m) is None or (t is not None and t > merged['timeouts'][m]):
+        merged['timeouts'][m] = t
+    merged['hosts'].update(data.get('hosts', {}))
+
+    for filename, file_results in data.get('results', {}).items():
+      for mode in result_modes(file_results):
+        for cnf in [False, True]:
+          fields = [f for f in Fields if (f in CNF_FIELDS) == cnf and mode in file_results.get(f, {}) and file_results[f][mode] is not None]
+          if not fields:
+            continue
+          entries = job_entries(data['results'], filename, mode, fields)
+          key = (filename, mode, cnf)
+          if not key in chosen:
+            chosen[key] = entries
+            continue
+
+          old, new = chosen[key], entries
+          if rank(new) >= rank(old):
+            old, new = new, old
+          # fields only one side measured are kept from either
+          fields = {e['field'] for e in old}
+          chosen[key] = old + [e for e in new if not e['field'] in fields]
+
+  for entries in chosen.values():
+    for entry in entries:
+      apply_entry(merged['results'], entry)
+
+  return merged
+
+def run_jobs(jobs, dice_path, timeout, n_jobs, results, trials, journal, cache=None, rss_interval=None, policy=None, limits=None, events=None, archive=None):
+  events = events or Events()
+  queue = deque(expand_trials(jobs, results, timeout, trials, policy))
+  print('Jobs:', len(jobs))
+  print('Trials:', len(queue))
+  print('Workers:', n_jobs)
+  print()
 
-      print('Mode:', mode)
-      
-      if results[Fields.TIME][mode] is not None and results[Fields.TIME][mode] != -1:
-        print('Skip')
+  states = {}
+  for job in jobs:
+    states[(job.filename, job.mode)] = {
+      'samples': {f:[] for f in job.fields if f in SAMPLED_FIELDS},
+      'values': {},
+      'rss': None,
+      'overhead': [],
+      'budget': None,
+      'remaining': trials.warmup + trials.repeat,
+      'next trial': trials.warmup + trials.repeat,
+      'failed': False
+    }
+
+  events.begin(jobs, queue, n_jobs, results, timeout)
+  executor = ThreadPoolExecutor(max_workers=n_jobs)
+  pending = {}
+  done = 0
+  try:
+    while queue or pending:
+      while queue and len(pending) < n_jobs:
+        job = queue.popleft()
+        state = states[(job.filename, job.mode)]
+        if state['failed']:
+          continue
+        if state['budget'] is None:
+          state['budget'] = job_budget(job, results, timeout, policy)
+          if state['budget'] is None:
+            state['failed'] = True
+            done += 1
+            events.job_done(job, 'skipped')
+            events.print('[%d/%d] %s %s: skip, timed out before with %ss' % (done, len(jobs), job.filename, job.mode, 
+              results[job.filename][extra('budget', job.fields)][job.mode]['seconds']))
+            continue
+        events.started_trial(job, state['budget']['seconds'])
+        pending[executor.submit(run, job, dice_path, state['budget']['seconds'], rss_interval, limits, archive)] = job
+
+      if not pending:
         continue
 
-      try:
-        t1 = time.time()
-        p = subprocess.Popen([dice_path, file, '-skip-table', '-show-time'] + cmd, 
-          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        out, err = p.communicate(timeout=timeout)
-        t2 = time.time()
-        results[Fields.TIME][mode] = round(t2 - t1, 4)
-
-      # try:
-      #   p = subprocess.Popen([dice_path, file, '-skip-table', '-show-time'] + cmd, 
-      #     stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-      #   out, err = p.communicate(timeout=timeout)
-      #   output = out.decode('utf-8')
-      #   time_pattern = re.compile('================\[ Compilation Time Elapsed \]================\s(\d+.?\d*)')
-        
-      #   time_matches = time_pattern.search(output)
+      finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+      for future in finished:
+        job = pending.pop(future)
+        state = states[(job.filename, job.mode)]
+        values = future.result()
+        events.finished_trial(job, values)
+        if state['failed']:
+          continue
+
+        status = status_of(next(iter(values.values())))
+        if status != 'ok':
+          state['failed'] = True
+          for f, v in values.items():
+            results[job.filename].setdefault(f, {})[job.mode] = v
+          results[job.filename].setdefault(extra('budget', job.fields), {})[job.mode] = state['budget']
+          stamp(job, results, cache)
+          journal.record(results, job.filename, job.mode, job.fields)
+          done += 1
+          events.job_done(job, status)
+          events.print('[%d/%d] %s %s:' % (done, len(jobs), job.filename, job.mode), status.upper(), 
+            '(%s budget %ss)' % (state['budget']['policy'], state['budget']['seconds']) if status == 'timeout' else '')
+          continue
+
+        state['remaining'] -= 1
+        if job.trial >= trials.warmup:
+          state['rss'] = values.pop('rss', None) or state['rss']
+          if 'overhead' in values:
+            state['overhead'].append(values.pop('overhead'))
+          for f, v in values.items():
+            if f in state['samples']:
+              state['samples'][f].append(v)
+            elif not f in state['values']:
+              state['values'][f] = v
+
+        if state['remaining'] > 0:
+          continue
+
+        samples = state['samples'].get(time_field(job.fields))
+        if trials.adaptive and samples and not converged(samples, trials):
+          state['remaining'] += 1
+          # trials finish out of order, so the index continues after the highest one handed out
+          queue.append(job._replace(trial=state['next trial']))
+          state['next trial'] += 1
+          events.queued(queue[-1])
+          continue
+
+        done += 1
+        events.job_done(job, 'ok')
+        events.print('[%d/%d] %s %s:' % (done, len(jobs), job.filename, job.mode), finalize(job, state, results))
+        stamp(job, results, cache)
+        journal.record(results, job.filename, job.mode, job.fields)
+        if cache:
+          cache.store(job, job_entries(results, job.filename, job.mode, job.fields))
+
+  except KeyboardInterrupt:
+    events.emit('interrupted')
+    events.print('Interrupted, saving finished jobs')
+    kill_running()
+    for job in jobs:
+      state = states[(job.filename, job.mode)]
+      if not state['failed'] and state['remaining'] > 0 \
+        and any(state['samples'].values()):
+        finalize(job, state, results)
+        stamp(job, results, cache)
+        journal.record(results, job.filename, job.mode, job.fields)
+  finally:
+    executor.shutdown(wait=False, cancel_futures=True)
 
-      #   if time_matches:
-      #     if not Fields.TIME in results:
-      #       results[Fields.TIME] = {}
-      #     results[Fields.TIME][mode] = float(time_matches.group(1))
+  return results
 
-      except subprocess.TimeoutExpired:
-        print('TIMEOUT')
-        p.terminate()
+MIN_DELTA = 0.01
+
+def compare_pair(job, dice_paths, timeout, limits=None):
+  # both binaries run back to back in random order, so drift hits them alike
+  order = list(range(len(dice_paths)))
+  random.shuffle(order)
+  values = [None] * len(dice_paths)
+  for i in order:
+    values[i] = run(job, dice_paths[i], timeout, limits=limits)
+  return values
+
+def compare_verdicts(job, sides, threshold, alpha):
+  rows = []
+  for f in job.fields:
+    base, new = sides[0][f], sides[1][f]
+    row = {'file': job.filename, 'mode': job.mode, 'field': f, 'base': None, 'new': None, 
+      'change': None, 'p': None, 'verdict': 'same'}
+    rows.append(row)
+
+    if not isinstance(base, list) or not isinstance(new, list):
+      row['base'] = base if not isinstance(base, list) else statistics.median(base)
+      row['new'] = new if not isinstance(new, list) else statistics.median(new)
+      # a benchmark the old build solved and the new one does not is always a regression
+      if isinstance(base, list):
+        row['verdict'] = 'regression'
+      elif isinstance(new, list):
+        row['verdict'] = 'improved'
+      continue
 
-    print()
-  
-  if Fields.SIZE in fields or Fields.CALLS in fields or Fields.FLIPS in fields \
-    or Fields.PARAMS in fields or Fields.DISTINCT in fields:
-    print('Measuring BDD size, number of recursive calls, and/or number of calls...')
-    cmd = [dice_path, file, '-skip-table']
-    if Fields.SIZE in fields:
-      cmd.append('-show-size')
-    if Fields.CALLS in fields:
-      cmd.append('-num-recursive-calls')
-
-    if not Fields.SIZE in fields and not Fields.CALLS in fields:
-      cmd.append('-no-compile')
-    
-    if Fields.FLIPS in fields:
-      cmd.append('-show-flip-count')
-    if Fields.PARAMS in fields:
-      cmd.append('-show-params')
-
-    for mode in modes:
-      mode_cmd = get_mode_cmd(mode)
-      if mode_cmd is None:
-        print('UNKNOWN MODE')
+    row['base'] = statistics.median(base)
+    row['new'] = statistics.median(new)
+    if row['base'] > 0:
+      row['change'] = row['new'] / row['base'] - 1
+    worse = row['new'] > row['base'] * (1 + threshold)
+    better = row['new'] < row['base'] * (1 - threshold)
+
+    if f in SAMPLED_FIELDS:
+      row['p'] = rank_sum_p(base, new)
+      significant = row['p'] < alpha
+      if f in SECONDS_FIELDS and abs(row['new'] - row['base']) < MIN_DELTA:
+        significant = False
+      worse, better = worse and significant, better and significant
+    # sizes and call counts are deterministic, any change beyond the threshold counts
+
+    if worse:
+      row['verdict'] = 'regression'
+    elif better:
+      row['verdict'] = 'improved'
+
+  return rows
+
+def run_compare(jobs, dice_paths, timeout, n_jobs, trials, threshold, alpha, limits=None):
+  queue = deque(expand_trials(jobs, {}, timeout, trials))
+  print('Jobs:', len(jobs))
+  print('Pairs:', len(queue))
+  print('Workers:', n_jobs)
+  print()
+
+  states = {}
+  for job in jobs:
+    states[(job.filename, job.mode)] = {
+      'sides': [{f:[] for f in job.fields} for _ in dice_paths],
+      'remaining': trials.warmup + trials.repeat
+    }
+
+  rows = []
+  done = 0
+  with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+    pending = {}
+    while queue or pending:
+      while queue and len(pending) < n_jobs:
+        job = queue.popleft()
+        if states[(job.filename, job.mode)]['remaining'] > 0:
+          pending[executor.submit(compare_pair, job, dice_paths, timeout, limits)] = job
+
+      if not pending:
         continue
 
-      print('Mode:', mode)
+      finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+      for future in finished:
+        job = pending.pop(future)
+        state = states[(job.filename, job.mode)]
+        if state['remaining'] <= 0:
+          continue
+
+        state['remaining'] -= 1
+        for side, values in zip(state['sides'], future.result()):
+          for f in job.fields:
+            status = status_of(values[f])
+            if status != 'ok':
+              # the side stays failed, the remaining pairs of the job are dropped
+              side[f] = values[f]
+              state['remaining'] = 0
+            elif isinstance(side[f], list) and job.trial >= trials.warmup:
+              side[f].append(values[f])
+
+        if state['remaining'] > 0:
+          continue
+
+        done += 1
+        job_rows = compare_verdicts(job, state['sides'], threshold, alpha)
+        rows += job_rows
+        print('[%d/%d] %s %s:' % (done, len(jobs), job.filename, job.mode), 
+          'REGRESSION' if any(r['verdict'] == 'regression' for r in job_rows) else 'ok')
 
-      skip = False
+  print()
+  return sorted(rows, key=lambda r: (r['file'], list(Modes).index(r['mode']), r['field']))
+
+def compare_table(rows, fmt='latex'):
+  def show(v, f):
+    if isinstance(v, str) or v == ERROR:
+      return MARKERS.get(v, '*')
+    if v is None:
+      return '-'
+    return '%.4f' % v if f in SECONDS_FIELDS else '{:,}'.format(int(v))
+
+  header = ['Benchmarks', 'Mode', 'Field', 'Base', 'New', 'Change %', 'p', 'Verdict']
+  table = []
+  bold = set()
+  for i, r in enumerate(rows):
+    table.append([r['file'].split('.')[0], Modes.to_column(r['mode']), str(r['field']), show(r['base'], r['field']), 
+      show(r['new'], r['field']), format_number(None if r['change'] is None else 100 * r['change'], '%+.1f'), 
+      format_number(r['p'], '%.3f'), r['verdict'].upper() if r['verdict'] == 'regression' else r['verdict']])
+    if r['verdict'] == 'regression':
+      bold.update((i, j) for j in range(1, len(header)))
+  return render_table('Comparison', header, table, fmt, bold)
+
+def cpt(rng, parents):
+  if not parents:
+    return 'flip %.3f' % rng.uniform(0.05, 0.95)
+  return '(if %s then %s else %s)' % (parents[0], cpt(rng, parents[1:]), cpt(rng, parents[1:]))
+
+def gen_chain(n, rng):
+  nodes = [('x0', cpt(rng, []))]
+  for i in range(1, n):
+    nodes.append(('x%d' % i, cpt(rng, ['x%d' % (i - 1)])))
+  return nodes
+
+def gen_grid(n, rng):
+  nodes = []
+  for i in range(n):
+    for j in range(n):
+      parents = ['x%d_%d' % (i - 1, j)] if i > 0 else []
+      parents += ['x%d_%d' % (i, j - 1)] if j > 0 else []
+      nodes.append(('x%d_%d' % (i, j), cpt(rng, parents)))
+  return nodes
+
+def gen_polytree(n, rng, max_parents=3):
+  # a random tree with random edge directions, emitted in topological order
+  parents = {i: [] for i in range(n)}
+  for i in range(1, n):
+    j = rng.randrange(i)
+    if rng.random() < 0.5 and len(parents[j]) < max_parents:
+      parents[j].append(i)
+    else:
+      parents[i].append(j)
+
+  order, emitted = [], set()
+  while len(order) < n:
+    for i in range(n):
+      if not i in emitted and all(p in emitted for p in parents[i]):
+        order.append(i)
+        emitted.add(i)
+  return [('x%d' % i, cpt(rng, ['x%d' % p for p in parents[i]])) for i in order]
+
+def gen_noisy_or(n, rng, width=4):
+  layer = ['x0_%d' % k for k in range(width)]
+  nodes = [(x, cpt(rng, [])) for x in layer]
+  for l in range(1, n):
+    parents, layer = layer, ['x%d_%d' % (l, k) for k in range(width)]
+    for x in layer:
+      # a noisy-OR of the whole previous layer with a leak
+      terms = ['(%s && flip %.3f)' % (p, rng.uniform(0.5, 0.95)) for p in parents]
+      nodes.append((x, '(%s || flip %.3f)' % (' || '.join(terms), rng.uniform(0.01, 0.1))))
+  return nodes
+
+GENERATORS = {
+  'chain': gen_chain,
+  'grid': gen_grid,
+  'polytree': gen_polytree,
+  'noisy-or': gen_noisy_or
+}
+
+SCALING_PATTERN = re.compile(r'^(.+)_(\d+)\.dice$')
+
+def write_program(files, family, n, seed=0):
+  rng = random.Random('%s:%d:%d' % (family, n, seed))
+  nodes = GENERATORS[family](n, rng)
+  filename = '%s_%d.dice' % (family, n)
+  file = os.path.join(files, filename)
+  # frontier searches of several modes write the same program while Dice may be reading it, 
+  # so it is swapped in whole. The content only depends on the name, so the last writer changes nothing
+  tmp = '%s.%d.%d.tmp' % (file, os.getpid(), threading.get_ident())
+  with open(tmp, 'w') as f:
+    for name, expr in nodes:
+      f.write('let %s = %s in\n' % (name, expr))
+    f.write(nodes[-1][0] + '\n')
+  os.replace(tmp, file)
+  return filename, file
+
+def fit_growth(ns, ys):
+  ns, ys = np.array(ns, dtype=float), np.log(np.array(ys, dtype=float))
+  total = ((ys - ys.mean()) ** 2).sum()
+  if total == 0:
+    return 'constant', 1.0
+
+  models = []
+  for name, xs in [('power', np.log(ns)), ('exp', ns)]:
+    slope, intercept = np.polyfit(xs, ys, 1)
+    residual = ((ys - (slope * xs + intercept)) ** 2).sum()
+    models.append((1 - residual / total, name, slope))
+  r2, name, slope = max(models)
+  return ('n^%.2f' % slope if name == 'power' else '%.2f^n' % math.exp(slope)), r2
+
+def growth_table(results, fields, modes, fmt='latex'):
+  families = {}
+  for filename in results:
+    match = SCALING_PATTERN.match(filename)
+    if match and match.group(1) in GENERATORS:
+      families.setdefault(match.group(1), []).append((int(match.group(2)), filename))
+
+  header = ['Family', 'Mode', 'Field', 'Points', 'Growth', 'R2', 'Largest solved n']
+  rows = []
+  for family in sorted(families):
+    for m in modes:
       for f in fields:
-        if f != Fields.TIME and f in results \
-          and mode in results[f] \
-          and results[f][mode] is not None \
-          and results[f][mode] != -1:
-          skip = True
-          break
-      if skip:
-        print('Skip')
+        points = sorted((n, results[filename].get(f, {}).get(m)) for n, filename in families[family])
+        solved = [(n, v) for n, v in points if is_value(v) and v > 0]
+        if not solved:
+          continue
+        growth, r2 = fit_growth(*zip(*solved)) if len(solved) >= 3 else ('-', np.nan)
+        rows.append([family, Modes.to_column(m), str(f), str(len(solved)), growth, format_number(r2, '%.3f'), str(solved[-1][0])])
+
+  if not rows:
+    return None
+  return render_table('Growth Curves', header, rows, fmt)
+
+def frontier(family, mode, files, dice_path, timeout, fields, results, seed=0, max_size=4096, limits=None):
+  def probe(n):
+    filename, file = write_program(files, family, n, seed)
+    values = run(Job(filename, file, mode, tuple(fields)), dice_path, timeout, limits=limits)
+    file_results = results.setdefault(filename, {})
+    for f, v in values.items():
+      if f in fields:
+        file_results.setdefault(f, {})[mode] = v
+    status = status_of(values[fields[0]])
+    print('%s %s n=%d:' % (family, mode, n), status.upper() if status != 'ok' else 
+      ', '.join('%s=%s' % (f, values[f]) for f in fields))
+    return status == 'ok'
+
+  # doubling until the first failure, then bisection between the last success and it
+  solved, failed = 0, None
+  n = 1
+  while n <= max_size:
+    if not probe(n):
+      failed = n
+      break
+    solved = n
+    n *= 2
+  if failed is None:
+    return solved
+
+  while failed - solved > 1:
+    n = (solved + failed) // 2
+    if probe(n):
+      solved = n
+    else:
+      failed = n
+  return solved
+
+def tune(files, dice_path, n_jobs, budget, eta=3, timeout=None, limits=None):
+  programs = [(filename, file) for filename, file in benchmarks(files, Modes.NOOPT)]
+  configs = flag_configs()
+  survivors = {filename: list(configs) for filename, _ in programs}
+  proxies = {}
+  times = {}
+  runs = 0
+
+  def measure(filename, file, flags, fields, seconds):
+    # the flags replace the ones of the mode, NOOPT adds none
+    values = run(Job(filename, file, Modes.NOOPT, fields, flags=flags), dice_path, seconds, limits=limits)
+    return filename, flags, values
+
+  # successive halving: rung 0 ranks every configuration by BDD size and recursive calls, 
+  # later rungs time the best 1/eta with eta times the budget and runs until one is left
+  rung = 0
+  with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+    while survivors:
+      seconds = budget * eta ** rung if timeout is None else min(budget * eta ** rung, timeout)
+      fields = (Fields.SIZE, Fields.CALLS) if rung == 0 else (Fields.TIME,)
+      repeat = 1 if rung == 0 else eta ** (rung - 1)
+      futures = [executor.submit(measure, filename, file, flags, fields, seconds) 
+        for filename, file in programs if filename in survivors for flags in survivors[filename] for _ in range(repeat)]
+
+      samples = {}
+      for future in futures:
+        filename, flags, values = future.result()
+        samples.setdefault((filename, flags), []).append(values)
+      runs += len(futures)
+
+      scores = {}
+      for (filename, flags), measured in samples.items():
+        ok = all(status_of(values[f]) == 'ok' for values in measured for f in fields)
+        if rung == 0:
+          proxies.setdefault(filename, {})[flags] = tuple(measured[0][f] for f in fields) if ok else None
+          scores[(filename, flags)] = proxies[filename][flags] or (math.inf, math.inf)
+        else:
+          times.setdefault(filename, {})[flags] = statistics.median(v[Fields.TIME] for v in measured) if ok else None
+          scores[(filename, flags)] = times[filename][flags] if ok else math.inf
+
+      print('Rung %d: %d runs with a %ss budget' % (rung, len(futures), round(seconds, 4)))
+      for filename in list(survivors):
+        ranked = sorted(survivors[filename], key=lambda flags: scores[(filename, flags)])
+        survivors[filename] = ranked[:max(1, math.ceil(len(ranked) / eta))]
+        if rung > 0 and len(survivors[filename]) == 1:
+          del survivors[filename]
+      rung += 1
+
+  best = {}
+  for filename, measured in times.items():
+    solved = {flags: t for flags, t in measured.items() if t is not None}
+    if solved:
+      flags = min(solved, key=solved.get)
+      # a configuration that ran out of the rung 0 budget may still solve with the longer ones, its size is then unknown
+      proxy = proxies[filename].get(flags)
+      best[filename] = {'flags': list(flags), 'time': solved[flags], 'size': proxy[0] if proxy else None}
+    else:
+      best[filename] = {'flags': None, 'time': None, 'size': None}
+
+  # overall: the configuration with the smallest geometric mean BDD size relative to the best of each program
+  ratios = {}
+  for filename, by_flags in proxies.items():
+    sizes = {flags: v[0] for flags, v in by_flags.items() if v is not None}
+    if not sizes:
+      continue
+    least = max(min(sizes.values()), 1)
+    for flags in configs:
+      ratios.setdefault(flags, []).append(max(sizes[flags], 1) / least if flags in sizes else math.inf)
+  geomean = lambda flags: math.exp(statistics.fmean(map(math.log, ratios[flags])))
+  overall = min(ratios, key=geomean) if ratios else None
+
+  return {
+    'programs': best,
+    'overall': list(overall) if overall is not None else None,
+    'overall size ratio': round(geomean(overall), 4) if overall is not None else None,
+    'runs': runs,
+    # timing every configuration as often as the last rung timed the winner
+    'brute force runs': len(programs) * len(configs) * eta ** max(rung - 2, 0)
+  }
+
+def tuning_table(tuning, fmt='latex'):
+  def describe(flags):
+    mode = config_mode(flags)
+    return config_name(flags) + (' (%s)' % Modes.to_column(mode) if mode else '')
+
+  header = ['Benchmarks', 'Best configuration', 'Time', 'Size']
+  rows = []
+  for filename in sorted(tuning['programs']):
+    best = tuning['programs'][filename]
+    if best['flags'] is None:
+      rows.append([filename.split('.')[0], '-', '-', '-'])
+    else:
+      rows.append([filename.split('.')[0], describe(best['flags']), '%.2f' % best['time'], 
+        '-' if best['size'] is None else '{:,}'.format(best['size'])])
+  if tuning['overall'] is not None:
+    rows.append(['Overall', describe(tuning['overall']), '-', 'x%.2f of the best' % tuning['overall size ratio']])
+
+  caption = 'Tuned Configurations (%d runs instead of %d to time every configuration as often)' % (tuning['runs'], tuning['brute force runs'])
+  return render_table(caption, header, rows, fmt)
+
+PREDICTED_FIELDS = [Fields.TIME, Fields.SIZE]
+
+def cheap_features(file_results, mode):
+  # the counts of the mode, or of any mode that has them, e.g. from older sweeps
+  modes = [mode] + sorted(m for m in file_results.get(Fields.FLIPS, {}) if m != mode)
+  for m in modes:
+    values = [file_results.get(f, {}).get(m) for f in NO_COMPILE_FIELDS]
+    if all(is_value(v) for v in values):
+      return np.array([1.0] + [math.log1p(v) for v in values])
+  return None
+
+class Predictor:
+  def __init__(self, ridge=1e-3):
+    self.ridge = ridge
+    self.models = {}
+    self.errors = {}
+
+  def solve(self, X, y):
+    return np.linalg.solve(X.T @ X + self.ridge * np.eye(X.shape[1]), X.T @ y)
+
+  def fit(self, datasets):
+    rows = {}
+    for results in datasets:
+      for file_results in results.values():
+        for field in PREDICTED_FIELDS:
+          for mode, value in file_results.get(field, {}).items():
+            x = cheap_features(file_results, mode)
+            if x is not None and is_value(value) and value > 0:
+              rows.setdefault((mode, field), []).append((x, math.log(value)))
+
+    for key, samples in rows.items():
+      if len(samples) <= len(samples[0][0]):
         continue
+      X = np.array([x for x, _ in samples])
+      y = np.array([v for _, v in samples])
+      self.models[key] = self.solve(X, y)
+      # leave-one-out error in log space
+      errors = []
+      for i in range(len(y)):
+        keep = np.arange(len(y)) != i
+        errors.append(abs(X[i] @ self.solve(X[keep], y[keep]) - y[i]))
+      self.errors[key] = errors
+    return self
+
+  def predict(self, file_results, mode, field):
+    x = cheap_features(file_results, mode)
+    if x is None or not (mode, field) in self.models:
+      return None
+    value = math.exp(x @ self.models[(mode, field)])
+    return round(value, 4) if field in SECONDS_FIELDS else int(round(value))
+
+def error_row(mode, field, errors):
+  errors = np.array(errors)
+  return [Modes.to_column(mode) if mode in MODE_FLAGS else str(mode), str(field), str(len(errors)), 
+    'x%.2f' % math.exp(np.median(errors)), '%.0f' % (100 * (errors <= math.log(2)).mean())]
+
+ERROR_HEADER = ['Mode', 'Field', 'Programs', 'Median error', 'Within 2x %']
+
+def predictor_table(predictor, fmt='latex'):
+  rows = [error_row(mode, field, predictor.errors[(mode, field)]) for mode, field in sorted(predictor.errors)]
+  if not rows:
+    return None
+  return render_table('Predictor Leave-One-Out Error', ERROR_HEADER, rows, fmt)
+
+def prediction_error_table(results, modes, fmt='latex'):
+  rows = []
+  for m in modes:
+    for field in PREDICTED_FIELDS:
+      errors = []
+      for file_results in results.values():
+        predicted = file_results.get('prediction', {}).get(m, {}).get(field)
+        value = file_results.get(field, {}).get(m)
+        if predicted and is_value(value) and value > 0:
+          errors.append(abs(math.log(predicted / value)))
+      if errors:
+        rows.append(error_row(m, field, errors))
+  if not rows:
+    return None
+  return render_table('Prediction Error on This Sweep', ERROR_HEADER, rows, fmt)
+
+def predict_jobs(jobs, results, predictor, select=None):
+  for job in jobs:
+    file_results = results[job.filename]
+    prediction = {f: predictor.predict(file_results, job.mode, f) for f in PREDICTED_FIELDS}
+    file_results.setdefault(extra('prediction', job.fields), {})[job.mode] = prediction
+
+  if not select:
+    return jobs
+
+  # keep the modes predicted fastest for every program, and those it cannot predict
+  keep = set()
+  for filename in {job.filename for job in jobs}:
+    predictions = results[filename][extra('prediction', jobs[0].fields)]
+    ranked = sorted((job for job in jobs if job.filename == filename and predictions[job.mode][Fields.TIME] is not None), 
+      key=lambda job: predictions[job.mode][Fields.TIME])
+    keep.update((job.filename, job.mode) for job in ranked[:select])
+    keep.update((job.filename, job.mode) for job in jobs if job.filename == filename and predictions[job.mode][Fields.TIME] is None)
+  return [job for job in jobs if (job.filename, job.mode) in keep]
+
+MISSING, SOLVED, TIMED_OUT, FAILED, OUT_OF_MEMORY, CPU_LIMITED = range(6)
+
+MARKERS = {TIMEOUT: 'TO', OOM: 'MO', CPU_LIMIT: 'CO'}
+
+def field_matrix(results, field, modes, files):
+  values = np.full((len(files), len(modes)), np.nan)
+  status = np.zeros((len(files), len(modes)), dtype=np.int8)
+  for i, filename in enumerate(files):
+    by_mode = results[filename].get(field, {})
+    for j, m in enumerate(modes):
+      value = by_mode.get(m)
+      if value == TIMEOUT:
+        status[i, j] = TIMED_OUT
+      elif value == OOM:
+        status[i, j] = OUT_OF_MEMORY
+      elif value == CPU_LIMIT:
+        status[i, j] = CPU_LIMITED
+      elif value == ERROR:
+        status[i, j] = FAILED
+      elif is_value(value):
+        values[i, j] = value
+        status[i, j] = SOLVED
+  return values, status
+
+def budget_matrix(results, timeouts, modes, files):
+  budgets = np.full((len(files), len(modes)), np.nan)
+  for j, m in enumerate(modes):
+    if timeouts.get(m) is not None:
+      budgets[:, j] = timeouts[m]
+  for i, filename in enumerate(files):
+    by_mode = results[filename].get('budget', {})
+    for j, m in enumerate(modes):
+      if m in by_mode and by_mode[m]['seconds'] is not None:
+        budgets[i, j] = by_mode[m]['seconds']
+  return budgets
+
+def row_min(values):
+  best = np.full(values.shape[0], np.nan)
+  solved = ~np.isnan(values).all(axis=1)
+  best[solved] = np.nanmin(values[solved], axis=1)
+  return best
+
+def col_mean(values):
+  means = np.full(values.shape[1], np.nan)
+  seen = ~np.isnan(values).all(axis=0)
+  means[seen] = np.nanmean(values[:, seen], axis=0)
+  return means
+
+def analyze(results, timeouts, field, modes, baseline=Modes.NOOPT):
+  files = sorted(results)
+  values, status = field_matrix(results, field, modes, files)
+  budgets = budget_matrix(results, timeouts, modes, files) if field == Fields.TIME else None
+  return analyze_matrix(values, status, budgets, field, modes, baseline)
+
+def analyze_matrix(values, status, budgets, field, modes, baseline=Modes.NOOPT):
+  best = row_min(values)
+
+  summary = {
+    'solved': (status == SOLVED).sum(axis=0),
+    'wins': np.isclose(values, best[:, None]).sum(axis=0),
+    'speedup': np.full(len(modes), np.nan),
+    'par2': np.full(len(modes), np.nan),
+    'vbs solved': int((~np.isnan(best)).sum()),
+    'vbs par2': np.nan,
+    'common': 0
+  }
 
-      try:
-        p = subprocess.Popen(cmd + mode_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        out, err = p.communicate(timeout=timeout)
-        output = out.decode('utf-8')
-        call_pattern = re.compile('================\[ Number of recursive calls \]================\s(\d+.?\d*)')
-        size_pattern = re.compile('================\[ Final compiled BDD size \]================\s(\d+.?\d*)')
-        flip_pattern = re.compile('================\[ Number of flips \]================\s(\d+.?\d*)')
-        param_pattern = re.compile('================\[ Number of Parameters \]================\s(\d+.?\d*)')
-        distinct_pattern = re.compile('================\[ Number of Distinct Parameters \]================\s(\d+.?\d*)')
-        
-        call_matches = call_pattern.search(output)
-        size_matches = size_pattern.search(output)
-        flip_matches = flip_pattern.search(output)
-        param_matches = param_pattern.search(output)
-        distinct_matches = distinct_pattern.search(output)
-
-        if call_matches:
-          if not Fields.CALLS in results:
-            results[Fields.CALLS] = {}
-          results[Fields.CALLS][mode] = int(float(call_matches.group(1)))
-        
-        if size_matches:
-          if not Fields.SIZE in results:
-            results[Fields.SIZE] = {}
-          results[Fields.SIZE][mode] = int(float(size_matches.group(1)))
-
-        if flip_matches:
-          if not Fields.FLIPS in results:
-            results[Fields.FLIPS] = {}
-          results[Fields.FLIPS][mode] = int(float(flip_matches.group(1)))
-
-        if param_matches:
-          if not Fields.PARAMS in results:
-            results[Fields.PARAMS] = {}
-          results[Fields.PARAMS][mode] = int(float(param_matches.group(1)))
-
-        if distinct_matches:
-          if not Fields.DISTINCT in results:
-            results[Fields.DISTINCT] = {}
-          results[Fields.DISTINCT][mode] = int(float(distinct_matches.group(1)))
-
-        if not call_matches and not size_matches and not flip_matches and not param_matches:
-          if not Fields.CALLS in results:
-            results[Fields.CALLS] = {}
-          if not Fields.SIZE in results:
-            results[Fields.SIZE] = {}
-          if not Fields.FLIPS in results:
-            results[Fields.FLIPS] = {}
-          if not Fields.PARAMS in results:
-            results[Fields.PARAMS] = {}
-          if not Fields.DISTINCT in results:
-            results[Fields.DISTINCT] = {}
-          results[Fields.SIZE][mode] = -1
-          results[Fields.CALLS][mode] = -1
-          results[Fields.FLIPS][mode] = -1
-          results[Fields.PARAMS][mode] = -1
-          results[Fields.DISTINCT][mode] = -1
-          print('ERROR:')
-          print(output)
-
-      except subprocess.TimeoutExpired:
-        print('TIMEOUT')
-        p.terminate()
+  if baseline in modes:
+    with np.errstate(divide='ignore', invalid='ignore'):
+      ratios = np.log(values[:, [modes.index(baseline)]] / values)
+    ratios[~np.isfinite(ratios)] = np.nan
+    summary['speedup'] = np.exp(col_mean(ratios))
+
+  if budgets is not None:
+    # PAR-2: unsolved runs count as twice their budget, over the files every mode was run on
+    scores = np.where(status == SOLVED, values, 2 * budgets)
+    common = scores[(status != MISSING).all(axis=1)]
+    summary['common'] = len(common)
+    if len(common):
+      summary['par2'] = col_mean(common)
+      summary['vbs par2'] = col_mean(row_min(common)[:, None])[0]
+    else:
+      # no file was run in every mode, so fall back to every mode's own files
+      summary['par2'] = col_mean(np.where(status != MISSING, scores, np.nan))
 
-    print()
+  return summary
 
-  return results
+STATUS_CODES = {'ok': SOLVED, 'timeout': TIMED_OUT, 'error': FAILED, OOM: OUT_OF_MEMORY, CPU_LIMIT: CPU_LIMITED}
 
-def problog(file, timeout):
-  print('========================================')
+CODE_VALUES = {TIMED_OUT: TIMEOUT, FAILED: ERROR, OUT_OF_MEMORY: OOM, CPU_LIMITED: CPU_LIMIT}
 
-  print('File:', file)
+Measurement = namedtuple('Measurement', ['filename', 'mode', 'field', 'value', 'status'])
 
-  print('Measuring time elapsed...')
+def as_mode(mode):
+  if isinstance(mode, Modes):
+    return mode
   try:
-    t1 = time.time()
-    p = subprocess.Popen(['problog', file], 
-      stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out, err = p.communicate(timeout=timeout)
-    t2 = time.time()
-    result = round(t2 - t1, 4)
-    print()
-    return result
+    return Modes(mode)
+  except ValueError:
+    return Modes.from_string(mode)
+
+class ResultSet:
+  # one float and one status code per (file, mode, field) instead of nested dicts, 
+  # so large sweeps stay small in memory and go straight into field_matrix style analysis
+  __slots__ = ['files', 'modes', 'fields', 'values', 'status', 'budgets', 'timeouts', 'index']
+
+  def __init__(self, files, modes, fields, timeouts=None):
+    self.files = list(files)
+    self.modes = [as_mode(m) for m in modes]
+    self.fields = [Fields(f) for f in fields]
+    self.values = np.full((len(self.files), len(self.modes), len(self.fields)), np.nan)
+    self.status = np.zeros(self.values.shape, dtype=np.int8)
+    self.budgets = np.full((len(self.files), len(self.modes)), np.nan)
+    self.timeouts = dict(timeouts or {})
+    for j, m in enumerate(self.modes):
+      if self.timeouts.get(m) is not None:
+        self.budgets[:, j] = self.timeouts[m]
+    self.index = [{key: i for i, key in enumerate(keys)} for keys in (self.files, self.modes, self.fields)]
+
+  @classmethod
+  def from_results(cls, results, timeouts=None, modes=None, fields=None):
+    if modes is None:
+      seen = set().union(*map(result_modes, results.values()))
+      modes = [m for m in Modes if m in seen]
+    if fields is None:
+      fields = [f for f in Fields if any(f in r for r in results.values())]
+    result_set = cls(sorted(results), modes, fields, timeouts)
+    for k, f in enumerate(result_set.fields):
+      result_set.values[:, :, k], result_set.status[:, :, k] = field_matrix(results, f, result_set.modes, result_set.files)
+    result_set.budgets = budget_matrix(results, result_set.timeouts, result_set.modes, result_set.files)
+    return result_set
+
+  @classmethod
+  def from_rows(cls, rows, timeouts=None):
+    # rows as returned by Store.query
+    files, modes, fields = set(), set(), set()
+    for file, mode, field, *_ in rows:
+      files.add(file)
+      modes.add(mode)
+      fields.add(field)
+    result_set = cls(sorted(files), [m for m in Modes if m in modes], [f for f in Fields if f in fields], timeouts)
+    file_index, mode_index, field_index = result_set.index
+    for file, mode, field, value, status, *_ in rows:
+      i, j, k = file_index[file], mode_index[mode], field_index[field]
+      result_set.status[i, j, k] = STATUS_CODES.get(status, FAILED)
+      if status == 'ok':
+        result_set.values[i, j, k] = value
+    return result_set
+
+  def __len__(self):
+    return int((self.status != MISSING).sum())
+
+  def matrix(self, field, modes=None):
+    modes = self.modes if modes is None else [as_mode(m) for m in modes]
+    k = self.index[2][Fields(field)]
+    columns = [self.index[1][m] for m in modes]
+    return self.values[:, columns, k], self.status[:, columns, k]
+
+  def value(self, i, j, k):
+    code = self.status[i, j, k]
+    if code != SOLVED:
+      return CODE_VALUES.get(code)
+    value = float(self.values[i, j, k])
+    return value if self.fields[k] in SECONDS_FIELDS else int(value)
+
+  def get(self, filename, mode, field):
+    file_index, mode_index, field_index = self.index
+    return self.value(file_index[filename], mode_index[as_mode(mode)], field_index[Fields(field)])
+
+  def records(self):
+    for i, j, k in zip(*np.nonzero(self.status != MISSING)):
+      value = self.value(i, j, k)
+      yield Measurement(self.files[i], self.modes[j], self.fields[k], value, status_of(value))
+
+  def to_results(self):
+    results = {filename: {} for filename in self.files}
+    for r in self.records():
+      results[r.filename].setdefault(r.field, {})[r.mode] = r.value
+    return results
+
+def load_results(path, fields=None, modes=None, files=None):
+  with open(path, 'rb') as f:
+    is_db = f.read(16) == b'SQLite format 3\x00'
+
+  if is_db:
+    store = Store(path)
+    try:
+      modes = None if modes is None else [as_mode(m) for m in modes]
+      return ResultSet.from_rows(store.query(fields, modes, files), store.timeouts())
+    finally:
+      store.close()
+
+  data = load_data(path)
+  results = data.get('results', {})
+  if files is not None:
+    results = {filename: results[filename] for filename in files if filename in results}
+  return ResultSet.from_results(results, data.get('timeouts'), modes, fields)
+
+def summarize(results, field=Fields.TIME, modes=None, baseline=Modes.NOOPT):
+  if not isinstance(results, ResultSet):
+    results = load_results(results)
+  modes = results.modes if modes is None else [as_mode(m) for m in modes]
+  values, status = results.matrix(field, modes)
+  budgets = None
+  if Fields(field) == Fields.TIME:
+    budgets = results.budgets[:, [results.index[1][m] for m in modes]]
+  return dict(analyze_matrix(values, status, budgets, Fields(field), modes, as_mode(baseline)), modes=modes)
+
+def run_matrix(files, modes, fields, dice_path='dice', timeout=None, n_jobs=1, repeat=1, warmup=0, out=None, cache=None, limits=None, flags=(), archive=None):
+  modes = [as_mode(m) for m in modes]
+  fields = [Fields(f) for f in fields]
+  data = {'timeouts': {m: timeout for m in modes}, 'results': {}}
+  results = data['results']
+  journal = Journal(os.path.splitext(out)[0] + '.journal.jsonl' if out else None, out, data)
+  cache = Cache(cache, dice_path) if cache or archive else None
+  archive = Archive(archive, cache=cache) if archive else None
+  if limits and limits.pin:
+    n_jobs = min(n_jobs, len(reserve_cpus(n_jobs)))
 
-  except subprocess.TimeoutExpired:
-    print('TIMEOUT')
-    p.terminate()
-    print()
+  try:
+    jobs = make_jobs(files, fields, modes, results, flags=flags)
+    if cache and cache.path:
+      jobs = from_cache(jobs, cache, results, journal, repeat)
+    run_jobs(jobs, dice_path, timeout, n_jobs, results, Trials(repeat, warmup, False, 0, repeat, None), journal, cache, limits=limits, archive=archive)
+  finally:
+    journal.close()
+
+  return ResultSet.from_results(results, data['timeouts'], modes, fields)
+
+def format_number(value, fmt='%.2f'):
+  return '-' if value is None or np.isnan(value) else fmt % value
+
+def render_table(caption, header, rows, fmt='latex', bold=()):
+  if fmt == 'csv':
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(header)
+    writer.writerows(rows)
+    return out.getvalue().rstrip('\n')
+
+  if fmt == 'markdown':
+    lines = ['**%s**' % caption, '', '| ' + ' | '.join(header) + ' |', '|' + '---|' + '---:|' * (len(header) - 1)]
+    for i, row in enumerate(rows):
+      cells = ['**%s**' % c if (i, j) in bold else c for j, c in enumerate(row)]
+      lines.append('| ' + ' | '.join(cells) + ' |')
+    return '\n'.join(lines)
+
+  table = Template("""\\begin{table}[h]
+\\caption{$caption}
+\\begin{tabular}{$alignments}
+\\toprule
+$columns \\\\
+\\midrule
+$rows
+\\bottomrule
+\\end{tabular}
+\\end{table}""")
+  lines = []
+  for i, row in enumerate(rows):
+    cells = ['\\textsc{' + row[0].replace('_', '\\_') + '}']
+    cells += ['\\textbf{%s}' % c if (i, j) in bold else c for j, c in enumerate(row) if j > 0]
+    lines.append(' & '.join(cells) + ' \\\\')
+  return table.substitute(caption=caption, alignments='l' + 'r' * (len(header) - 1), 
+    columns=' & '.join(header), rows='\n'.join(lines))
+
+def analytics_table(results, timeouts, field, modes, baseline, fmt='latex'):
+  summary = analyze(results, timeouts, field, modes, baseline)
+  if not summary['solved'].any():
     return None
 
-def cnf(file, dice_path, timeout, results):
-  print('========================================')
-
-  print('File:', file)
-
-  modes = [Modes.DET, Modes.FH]
+  order = sorted(range(len(modes)), key=lambda j: (-summary['solved'][j], 
+    np.nan_to_num(summary['par2'][j], nan=np.inf), -np.nan_to_num(summary['speedup'][j])))
+
+  ratio = 'Speedup' if field in SECONDS_FIELDS else 'Reduction'
+  header = ['Mode', 'Rank', 'Solved', 'PAR-2', '%s vs %s' % (ratio, Modes.to_column(baseline)), 'Best']
+  rows = []
+  for rank, j in enumerate(order, 1):
+    rows.append([Modes.to_column(modes[j]), str(rank), str(summary['solved'][j]), 
+      format_number(summary['par2'][j]), format_number(summary['speedup'][j]), str(summary['wins'][j])])
+  rows.append(['Virtual Best', '-', str(summary['vbs solved']), format_number(summary['vbs par2']), '-', '-'])
+
+  caption = '%s Summary' % str(field).capitalize()
+  if field == Fields.TIME and summary['common']:
+    caption += ' (PAR-2 over %d benchmarks run in every mode)' % summary['common']
+  elif field == Fields.TIME:
+    caption += ' (PAR-2 over the benchmarks each mode was run on)'
+  return render_table(caption, header, rows, fmt, bold={(0, c) for c in range(1, len(header))})
+
+def overhead_table(results, modes, fmt='latex'):
+  header = ['Mode', 'Files', 'Spawn', 'Wall', 'CPU', 'Compile', 'Other', 'Other %']
+  rows = []
+  for m in modes:
+    parts = [r['overhead'][m] for r in results.values() if m in r.get('overhead', {})]
+    if not parts:
+      continue
+    medians = {}
+    for part in OVERHEAD_PARTS:
+      values = [p[part] for p in parts if p[part] is not None]
+      medians[part] = statistics.median(values) if values else np.nan
+    share = 100 * medians['other'] / medians['wall'] if medians['wall'] else np.nan
+    rows.append([Modes.to_column(m), str(len(parts))] + [format_number(medians[part], '%.4f') for part in OVERHEAD_PARTS] + 
+      [format_number(share, '%.1f')])
+
+  if not rows:
+    return None
+  return render_table('Median Overhead Breakdown (s)', header, rows, fmt)
+
+COLORS = [
+  'tab:blue', 
+  'tab:orange', 
+  'tab:green', 
+  'tab:red', 
+  'tab:purple', 
+  'tab:brown', 
+  'tab:pink', 
+  'tab:gray', 
+  'tab:olive'
+]
+
+def pyplot():
+  # imported on demand so sweeps on headless workers never pay for matplotlib
+  import matplotlib
+  matplotlib.use('Agg')
+  import matplotlib.pyplot as plt
+  return plt
+
+def plot_colors(plt, n):
+  if n <= len(COLORS):
+    return COLORS[:n]
+  cmap = plt.get_cmap('tab20')
+  return [cmap(i % cmap.N) for i in range(n)]
+
+def plot_time_cactus(old_results, timeouts, modes, labels, plot_name):
+  plt = pyplot()
+  plt.figure()
+
+  for m, color, label in zip(modes, plot_colors(plt, len(modes)), labels):
+    y_data = []
+    y_timeouts = []
+    for filename in old_results.keys():
+      value = old_results[filename].get(Fields.TIME, {}).get(m)
+      if is_value(value) and value > 0:
+        # y_data.append(value)
+        y_data.append(math.log(value))
+      elif value == TIMEOUT and timeouts.get(m):
+        # y_timeouts.append(timeouts[m])
+        y_timeouts.append(math.log(timeouts[m]))
+
+    y_data.sort()
+
+    y_timeouts = y_data[-1:] + y_timeouts
+
+    x_data = [x for x in range(len(y_data))]
+    x_timeouts = [x + len(x_data) - 1 for x in range(len(y_timeouts))]
+
+    plt.plot(x_data, y_data, 'o-', color=color, label=label)
+    plt.plot(x_timeouts, y_timeouts, 'x-', color=color)
+
+  plt.xlabel('Benchmarks')
+  # plt.ylabel('Time (s)')
+  plt.ylabel('Time (log s)')
+  plt.legend()
+
+  plt.grid(True, ls=':')
+
+  plt.savefig(plot_name, bbox_inches='tight')
+  plt.close()
+  return plot_name
+
+def plot_size_bars(old_results, modes, labels, plot_name):
+  plt = pyplot()
+  plt.figure(figsize=(20,15))
+  width = 0.8 / len(modes)
+  files = sorted(old_results.keys())
+  x_data = [x for x in range(len(files))]
+
+  for m, color, label in zip(modes, plot_colors(plt, len(modes)), labels):
+    y_data = []
+    for filename in files:
+      value = old_results[filename].get(Fields.SIZE, {}).get(m)
+      if is_value(value) and value > 0:
+        # y_data.append(value)
+        y_data.append(math.log(value, 10))
+      else:
+        y_data.append(0)
 
-  print('Measuring BDD size, number of recursive calls, and/or number of calls...')
-  cmd = [dice_path, file, '-cnf', '-show-cnf-decisions', '-fc-timeout', '5']
-  for mode in modes:
-    if Fields.SIZE in results:
-      if results[Fields.SIZE][mode] is not None and results[Fields.SIZE][mode] != -1:
-        print('Skip')
-        continue
+    plt.bar(x_data, y_data, color=color, width=width, label=label)
+    x_data = [x+width for x in x_data]
 
-    mode_cmd = get_mode_cmd(mode)
-    if mode_cmd is None:
-      print('UNKNOWN MODE')
-      continue
+  names = [f.split('.')[0] for f in files]
+  x_data = [x - width * (len(modes) + 1) / 2 for x in x_data]
+  plt.xticks(x_data, names, rotation=-45, ha="left", rotation_mode="anchor")
+  plt.xlabel('Benchmarks')
+  # plt.ylabel('BDD Size')
+  plt.ylabel('BDD Size (log10)')
+  plt.legend()
 
-    print('Mode:', mode)
+  plt.grid(True, ls=':')
 
-    try:
-      p = subprocess.Popen(cmd + mode_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-      out, err = p.communicate(timeout=timeout)
-      output = out.decode('utf-8')
-      dec_pattern = re.compile('================\[ Total CNF decisions \]================\s(\d+.?\d*)')
-      dec_matches = dec_pattern.search(output)
-
-      if dec_matches:
-        if not Fields.SIZE in results:
-          results[Fields.SIZE] = {}
-        results[Fields.SIZE][mode] = int(float(dec_matches.group(1)))
-      
-      
-      if not dec_matches :
-        if not Fields.SIZE in results:
-          results[Fields.SIZE] = {}
-        results[Fields.SIZE][mode] = -1
-        print('ERROR:')
-        print(output)
+  plt.savefig(plot_name, bbox_inches='tight')
+  plt.close()
+  return plot_name
 
-    except subprocess.TimeoutExpired:
-      print('TIMEOUT')
-      p.terminate()
+def render_plots(figures, n_jobs=None):
+  n_jobs = min(len(figures), n_jobs or os.cpu_count() or 1)
+  if n_jobs <= 1:
+    return [fn(*args) for fn, args in figures]
 
-  print()
-  
-  return results
+  # figures rendered in worker processes are not seen by --profile
+  with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+    futures = [executor.submit(fn, *args) for fn, args in figures]
+    return [future.result() for future in futures]
 
 def main():
   parser = argparse.ArgumentParser(description="Test harness for Dice experiments.")
@@ -332,7 +2586,13 @@ def main():
   parser.add_argument('-o', '--out', type=str, nargs='?', const='results.json', default='results.json', help='path to output file. Defaults to results.json')
   parser.add_argument('--table', action='store_true', help='prints data from output file as Latex table')
   parser.add_argument('--plot', action='store_true', help='generate plots')
-  parser.add_argument('--columns', nargs='+', type=Modes.from_string, choices=list(Modes), help='select modes to include in the table or plot')
+  parser.add_argument('--analytics', action='store_true', help='prints solved counts, PAR-2 scores, geometric mean speedups and virtual best rankings per mode')
+  parser.add_argument('--overhead', action='store_true', help='prints the median spawn latency, wall, CPU and Dice compile time per mode, and the wall time Dice does not report as compilation')
+  parser.add_argument('--profile', action='store_true', help='reports where the harness itself spends its time')
+  parser.add_argument('--format', choices=['latex', 'csv', 'markdown'], default='latex', help='output format of --table and --analytics. Defaults to latex')
+  parser.add_argument('--baseline', type=Modes.from_string, choices=list(Modes), default='NOOPT', help='mode that --analytics computes speedups against. Defaults to NOOPT')
+  parser.add_argument('--labels', nargs='+', help='legend labels for --plot, one per column. Defaults to the column names')
+  parser.add_argument('--columns', nargs='+', type=Modes.from_string, choices=list(Modes), help='select modes to include in the table or plot. Defaults to the modes found in the results')
 
   parser.add_argument('--timeout', type=int, nargs=1, help='sets timeout in seconds')
   parser.add_argument('-t', '--time', dest='fields', action='append_const', const=Fields.TIME, help='record time elapsed')
@@ -341,13 +2601,82 @@ def main():
   parser.add_argument('-f', '--flips', dest='fields', action='append_const', const=Fields.FLIPS, help='record number of flips')
   parser.add_argument('-p', '--params', dest='fields', action='append_const', const=Fields.PARAMS, help='record number of parameters')
   parser.add_argument('-dp', '--distinct', dest='fields', action='append_const', const=Fields.DISTINCT, help='record number of distinct parameters')
-
-  parser.add_argument('--problog', action='store_true', help='runs Problog programs')
-  parser.add_argument('--cnf', action='store_true', help="runs Dice with sharpSAT")
-
+  parser.add_argument('-m', '--memory', dest='fields', action='append_const', const=Fields.MEMORY, help='record peak resident memory in KB')
+  parser.add_argument('-u', '--cpu', dest='fields', action='append_const', const=Fields.USER_CPU, help='record user and system CPU time')
+  parser.add_argument('--journal', type=str, help='path to the append-only measurement journal. Defaults to the output file with a .journal.jsonl extension')
+  parser.add_argument('--resume', action='store_true', help='replay the journal and skip jobs it already completed')
+  parser.add_argument('--cache', type=str, default='.dice_cache', help='directory of cached results keyed on the Dice binary, program and flags. Defaults to .dice_cache')
+  parser.add_argument('--no-cache', action='store_true', help='always run Dice instead of serving unchanged jobs from the cache')
+  parser.add_argument('--archive', type=str, nargs='?', const='.dice_archive', help='keeps the compressed raw output of every run in this directory, keyed like the cache. Defaults to .dice_archive')
+  parser.add_argument('--archive-format', choices=list(ARCHIVE_OPENERS), default='gz', help='compression of the archive, gz is cheaper to write while Dice runs and xz is smaller. Defaults to gz')
+  parser.add_argument('--reparse', action='store_true', help='fills missing values of the selected fields in the output file from the archived output of earlier runs, without running Dice. Only fields Dice printed in those runs can be found')
+  parser.add_argument('--policy', choices=['flat', 'history', 'predicted'], default='flat', help='timeout budget policy. history skips jobs that already timed out with at least the same budget and caps each mode at --par-k times the best known time of the file. predicted caps it at --par-k times the --predict estimate. Defaults to flat')
+  parser.add_argument('--predict', action='store_true', help='counts flips and parameters with -no-compile first and predicts time and size of every job from them, to order the queue by')
+  parser.add_argument('--train', nargs='+', help='result files --predict learns from besides the output file, e.g. results_all.json')
+  parser.add_argument('--select', type=int, help='with --predict, only runs the given number of modes predicted fastest for every program')
+  parser.add_argument('--par-k', type=float, default=10, help='multiple of the best known time used as the budget by --policy history. Defaults to 10')
+  parser.add_argument('--cheapest-first', action='store_true', help='run the modes with the lowest median time first')
+  parser.add_argument('--shard', type=parse_shard, help='only run the i-th of n deterministic partitions of the jobs, written as i/n')
+  parser.add_argument('--merge', nargs='+', help='merge the given result files, e.g. from --shard runs, into the output file')
+  parser.add_argument('--merge-by', choices=['timestamp', 'key'], default='timestamp', help='how --merge resolves a file and mode measured in several inputs. key prefers results from the --dice binary, then the newest. Defaults to timestamp')
+  parser.add_argument('--db', type=str, help='SQLite store that keeps one row per measurement across runs. Sweeps append to it and --table and --plot read from it')
+  parser.add_argument('--db-import', nargs='+', help='import result files in the JSON format into --db')
+  parser.add_argument('--db-export', type=str, help='export the latest measurements in --db to a result file in the JSON format')
+  parser.add_argument('--mem-limit', type=int, help='address space limit of every child in MB. Runs that hit it are recorded as oom')
+  parser.add_argument('--cpu-limit', type=int, help='CPU time limit of every child in seconds. Runs that hit it are recorded as cpu-limit')
+  parser.add_argument('--files-limit', type=int, help='open file limit of every child')
+  parser.add_argument('--cgroup', type=str, help='delegated cgroup v2 directory to run every child in its own sub-cgroup of, which also enforces --mem-limit without swap')
+  parser.add_argument('--pin', action='store_true', help='pins every running child to a core of its own and the harness to another one, if there are enough cores')
+  parser.add_argument('--max-load', type=float, help='refuses to start a sweep while the 1 minute load average is above this. Without it, the harness only warns when the load would distort timings')
+  parser.add_argument('--events', type=str, help='appends a JSON line for every job queued, started, finished, timed out or failed to the given file')
+  parser.add_argument('--metrics', type=str, help='Prometheus textfile the sweep progress is written to, e.g. for the node exporter textfile collector')
+  parser.add_argument('--metrics-interval', type=float, default=10, help='seconds between --metrics updates. Defaults to 10')
+  parser.add_argument('--live', action='store_true', help='shows a status line with throughput, ETA and worker utilization on stderr')
+  parser.add_argument('--sample-rss', type=float, nargs='?', const=0.1, help='record a resident memory time series, sampled every given seconds. Defaults to 0.1')
+
+  parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='runs the same jobs with two Dice binaries, interleaved, and exits with 1 if NEW regresses. Fields default to time, size and calls')
+  parser.add_argument('--compare-out', type=str, default='compare_results.json', help='output file of --compare, kept apart from the -o results. Defaults to compare_results.json')
+  parser.add_argument('--threshold', type=float, default=0.05, help='relative growth of a field that --compare reports as a regression. Defaults to 0.05')
+  parser.add_argument('--alpha', type=float, default=0.01, help='significance level of the Mann-Whitney test --compare applies to timings. Defaults to 0.01')
+  parser.add_argument('--problog', action='store_true', help='also runs the .pl Problog programs of the directory as the PROBLOG mode. Fields default to time, memory and CPU')
+  parser.add_argument('--cnf', action='store_true', help="compiles to CNF and counts with sharpSAT instead of building BDDs. Records cnf time, cnf memory and decisions, or those of -t and -m")
+  parser.add_argument('--fc-timeout', type=int, default=5, help='timeout in seconds Dice passes on to sharpSAT under --cnf. Defaults to 5')
+
+  parser.add_argument('--generate', nargs='+', choices=list(GENERATORS), help='writes synthetic programs of the given families for each of --sizes into the experiment directory')
+  parser.add_argument('--sizes', nargs='+', type=int, default=[2, 4, 8, 16, 32], help='sizes n of the --generate programs. Defaults to 2 4 8 16 32')
+  parser.add_argument('--seed', type=int, default=0, help='seed of the --generate and --frontier probabilities and structures. Defaults to 0')
+  parser.add_argument('--fit', action='store_true', help='prints growth curves fitted to the results of generated programs per family, mode and field')
+  parser.add_argument('--frontier', nargs='+', choices=list(GENERATORS), help='searches, by doubling then bisection, the largest n of each family every mode solves within --timeout')
+  parser.add_argument('--max-size', type=int, default=4096, help='largest n --frontier tries. Defaults to 4096')
+  parser.add_argument('--tune', action='store_true', help='searches every combination of the Dice optimization flags for the best one per program and overall with successive halving')
+  parser.add_argument('--tune-budget', type=float, default=1, help='timeout in seconds of the first --tune rung, which ranks by BDD size and calls. Defaults to 1')
+  parser.add_argument('--eta', type=int, default=3, help='--tune keeps the best 1/eta configurations per rung and gives the next eta times the budget. Defaults to 3')
   parser.add_argument('--modes', nargs='*', type=Modes.from_string, choices=list(Modes), help='select modes to run over')
+  parser.add_argument('-j', '--jobs', type=int, default=1, help='number of Dice processes to run in parallel. Defaults to 1')
+  parser.add_argument('--repeat', type=int, default=1, help='number of measured runs per file and mode. Defaults to 1')
+  parser.add_argument('--warmup', type=int, default=0, help='number of discarded warm-up runs per file and mode. Defaults to 0')
+  parser.add_argument('--adaptive', action='store_true', help='keep repeating until the confidence interval of the median time is tight')
+  parser.add_argument('--ci-width', type=float, default=0.05, help='target confidence interval half-width relative to the median for --adaptive. Defaults to 0.05')
+  parser.add_argument('--max-repeat', type=int, default=30, help='maximum number of measured runs for --adaptive. Defaults to 30')
+  parser.add_argument('--time-budget', type=float, help='stop --adaptive repeats once the measured runs of a file and mode take this many seconds')
 
   args = parser.parse_args()
+  profiler.enabled = args.profile
+
+  limits = None
+  if args.cgroup and not cgroup_available(args.cgroup):
+    print('WARNING: %s is not a writable cgroup v2 directory, running without cgroups' % args.cgroup)
+    args.cgroup = None
+  if args.mem_limit or args.cpu_limit or args.files_limit or args.cgroup or args.pin:
+    limits = Limits(args.mem_limit, args.cpu_limit, args.files_limit, args.cgroup, args.pin)
+    missing = limit_wrappers(limits)
+    if missing:
+      print('ERRORS: the limits need %s on the PATH' % ' and '.join(missing))
+      exit(2)
+  if args.pin:
+    workers = reserve_cpus(args.jobs)
+    args.jobs = min(args.jobs, len(workers))
+    print('Worker cores:', ', '.join(map(str, workers)))
   
   out = args.out
 
@@ -357,83 +2686,130 @@ def main():
   }
 
   if os.path.exists(out):
-    with open(out, 'r') as f:
-      old_data = json.load(f)
+    old_data = load_data(out)
 
-  if args.problog:
-    files = args.dir[0]
-    results = {}
-    if not os.path.isdir(files):
+  if args.generate:
+    files = args.dir[0] if args.dir else None
+    if not files:
+      print('Please give the directory to write programs into with -i')
+      exit(2)
+    os.makedirs(files, exist_ok=True)
+    for family in args.generate:
+      for n in args.sizes:
+        write_program(files, family, n, args.seed)
+    print('Generated %d programs in %s' % (len(args.generate) * len(args.sizes), files))
+
+  if args.merge:
+    print('Merging:', ', '.join(args.merge))
+    datas = []
+    for path in args.merge:
+      datas.append(load_data(path))
+
+    dice_hash = None
+    if args.merge_by == 'key' and args.dice:
+      dice_hash = Cache(args.cache, args.dice[0]).dice_hash
+    old_data = merge_results(datas, args.merge_by, dice_hash)
+    save_json(out, old_data)
+    print('Saved to %s' % out)
+
+  elif args.compare:
+    files = args.dir[0] if args.dir else None
+    if not files or not os.path.isdir(files):
       print('Invalid directory specified:', files)
       exit(2)
-    else:
-      print('Experiment dir:', files)
-      print('Output file:', out)
-
-      if args.timeout:
-        print('Timeout:', args.timeout[0])
-        timeout = args.timeout[0]
-      else:
-        timeout = None
+    if not args.modes:
+      print('Please select at least one mode')
+      exit(2)
 
-      print()
+    timeout = args.timeout[0] if args.timeout else None
+    out = args.compare_out
+    print('Experiment dir:', files)
+    print('Base:', args.compare[0])
+    print('New:', args.compare[1])
+    print('Output file:', out)
+    if timeout:
+      print('Timeout:', timeout)
+    if args.repeat < 5:
+      print('WARNING: with fewer than 5 runs per binary, timings are never significant. Use --repeat')
+    for warning in timing_warnings(args.jobs):
+      print('WARNING:', warning)
+    print()
 
-      for filename in os.listdir(files):
-        file = os.path.join(files, filename)
-        if os.path.isfile(file) and os.path.splitext(file)[-1].lower() == '.pl':
-          results[filename] = problog(file, timeout)
+    fields = args.fields or [Fields.TIME, Fields.SIZE, Fields.CALLS]
+    jobs = make_jobs(files, fields, args.modes, {})
+    trials = Trials(args.repeat, args.warmup, False, args.ci_width, args.repeat, None)
+    rows = run_compare(jobs, args.compare, timeout, args.jobs, trials, args.threshold, args.alpha, limits)
+    print(compare_table(rows, args.format))
+
+    save_json(out, {
+      'dice': [Cache(args.cache, d).dice_hash for d in args.compare],
+      'threshold': args.threshold,
+      'alpha': args.alpha,
+      'repeat': args.repeat,
+      'machine': host_info(),
+      'comparison': rows
+    })
+    print('Saved to %s' % out)
+
+    regressions = [r for r in rows if r['verdict'] == 'regression']
+    if regressions:
+      print('REGRESSIONS: %d of %d measurements' % (len(regressions), len(rows)))
+      exit(1)
+
+  elif args.frontier:
+    files = args.dir[0] if args.dir else None
+    if not files or not args.modes or not args.timeout:
+      print('--frontier needs -i, --modes and --timeout')
+      exit(2)
+    os.makedirs(files, exist_ok=True)
+
+    timeout = args.timeout[0]
+    dice_path = args.dice[0] if args.dice else './'
+    fields = args.fields or [Fields.TIME, Fields.SIZE, Fields.CALLS]
+    results = old_data.setdefault('results', {})
+    for m in args.modes:
+      old_data['timeouts'][m] = timeout
+
+    searches = [(family, m) for family in args.frontier for m in args.modes]
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+      futures = [executor.submit(frontier, family, m, files, dice_path, timeout, fields, results, args.seed, args.max_size, limits) 
+        for family, m in searches]
+      for (family, m), future in zip(searches, futures):
+        old_data.setdefault('frontier', {}).setdefault(family, {})[m] = future.result()
+    save_json(out, old_data)
 
-      print()
-      
-    with open('problog_results.json', 'w') as f:
-      json.dump(results, f, indent=4)
+    print()
+    header = ['Family'] + list(map(Modes.to_column, args.modes))
+    rows = [[family] + [str(old_data['frontier'][family][m]) for m in args.modes] for family in args.frontier]
+    print(render_table('Largest n solved within %ss' % timeout, header, rows, args.format))
 
-  elif args.cnf:
-    files = args.dir[0]
-    out = 'cnf_results.json'
-    if os.path.exists(out):
-      with open(out) as f:
-        results = json.load(f)
-    else:
-      results = {}
-    if not os.path.isdir(files):
+  elif args.tune:
+    files = args.dir[0] if args.dir else None
+    if not files or not os.path.isdir(files):
       print('Invalid directory specified:', files)
       exit(2)
-    else:
-      print('Experiment dir:', files)
-      print('Output file:', out)
-
-      if args.timeout:
-        print('Timeout:', args.timeout[0])
-        timeout = args.timeout[0]
-      else:
-        timeout = None
-
-      if args.dice:
-        dice_path = args.dice[0]
-      else:
-        dice_path = './'
 
-      print()
-
-      for filename in os.listdir(files):
-        file = os.path.join(files, filename)
-        if os.path.isfile(file) and os.path.splitext(file)[-1].lower() == '.dice':
-          if filename in results:
-            file_results = results[filename]
-          else:
-            file_results = {}
-          if not Fields.SIZE in file_results:
-            modes = [Modes.DET, Modes.FH]
-            file_results[Fields.SIZE] = {m:None for m in modes}
-          results[filename] = cnf(file, dice_path, timeout, file_results)
+    dice_path = args.dice[0] if args.dice else './'
+    timeout = args.timeout[0] if args.timeout else None
+    print('Experiment dir:', files)
+    print('Configurations:', len(flag_configs()))
+    print()
 
-      print()
-      
-    with open(out, 'w') as f:
-      json.dump(results, f, indent=4)
+    old_data['tuning'] = tune(files, dice_path, args.jobs, args.tune_budget, args.eta, timeout, limits)
+    save_json(out, old_data)
+    print()
+    print(tuning_table(old_data['tuning'], args.format))
+
+  elif args.dir and (args.modes or not args.generate):
+    if args.problog:
+      args.modes = [m for m in args.modes or [] if m != Modes.PROBLOG] + [Modes.PROBLOG]
+      args.fields = args.fields or [Fields.TIME, Fields.MEMORY, Fields.USER_CPU]
+    flags = []
+    if args.cnf:
+      requested = args.fields or [Fields.TIME, Fields.MEMORY]
+      args.fields = [f for f, g in [(Fields.CNF_TIME, Fields.TIME), (Fields.CNF_MEMORY, Fields.MEMORY)] if g in requested] + [Fields.DECISIONS]
+      flags = ['-fc-timeout', str(args.fc_timeout)]
 
-  elif args.dir:
     files = args.dir[0]
     if not os.path.isdir(files):
       print('Invalid directory specified:', files)
@@ -466,210 +2842,211 @@ def main():
 
       print()
 
-      if 'results' in old_data:
-        results = old_data['results']
-      else:
-        results = {}
-
-      for filename in sorted(os.listdir(files)):
-        file = os.path.join(files, filename)
-        if os.path.isfile(file) and os.path.splitext(file)[-1].lower() == '.dice':
-          if filename in results:
-            file_results = results[filename]
-          else:
-            file_results = {}
+      results = old_data.setdefault('results', {})
+      cache = Cache(args.cache, dice_path)
+      host = socket.gethostname() + (' shard %d/%d' % args.shard if args.shard else '')
+      old_data.setdefault('hosts', {})[host] = host_info(cache.dice_hash, args.shard)
+      old_data.setdefault('machines', {})[machine_info()['id']] = machine_info()
 
-          for f in fields:
-            if not f in file_results:
-              file_results[f] = {m:None for m in modes}
-            else:
-              for m in modes:
-                if not m in file_results[f]:
-                  file_results[f][m] = None
+      load = os.getloadavg()[0]
+      if args.max_load is not None and load > args.max_load:
+        print('ERRORS: load average %.2f is above --max-load %g' % (load, args.max_load))
+        exit(2)
+      for warning in timing_warnings(args.jobs):
+        print('WARNING:', warning)
+      journal_path = args.journal or os.path.splitext(out)[0] + '.journal.jsonl'
+      print('Journal:', journal_path)
+      store = Store(args.db, cache.dice_hash) if args.db else None
+      journal = Journal(journal_path, out, old_data, args.resume, store=store, timeout=timeout, repeat=args.repeat)
+      events = Events(args.events, args.metrics, args.live, args.metrics_interval)
+      events.emit('sweep', dir=files, modes=modes, fields=fields, workers=args.jobs, timeout=timeout)
 
-          try:
-            results[filename] = run(file, dice_path, timeout, fields, modes, file_results)
-          except KeyboardInterrupt:
-            break
+      try:
+        with profiler.phase('scan'):
+          jobs = make_jobs(files, fields, modes, results, journal.completed, flags)
+          if args.shard:
+            print('Shard: %d/%d' % args.shard)
+            jobs = [job for job in jobs if in_shard(job, args.shard)]
+        trials = Trials(args.repeat, args.warmup, args.adaptive, args.ci_width, args.max_repeat, args.time_budget)
+        policy = Policy(args.policy, args.par_k, args.cheapest_first)
+        if args.predict:
+          with profiler.phase('scan'):
+            feature_jobs = make_jobs(files, NO_COMPILE_FIELDS, modes, results, journal.completed, flags)
+            if args.shard:
+              feature_jobs = [job for job in feature_jobs if in_shard(job, args.shard)]
+          if not args.no_cache:
+            feature_jobs = from_cache(feature_jobs, cache, results, journal)
+          print('Counting features')
+          run_jobs(feature_jobs, dice_path, timeout, args.jobs, results, Trials(1, 0, False, 0, 1, None), journal, cache, limits=limits, events=events)
+
+          datasets = [results] + [load_data(path)['results'] for path in args.train or []]
+          predictor = Predictor().fit(datasets)
+          table = predictor_table(predictor, args.format)
+          if table:
+            print(table)
+          print()
+          jobs = predict_jobs(jobs, results, predictor, args.select)
+
+        if not args.no_cache:
+          with profiler.phase('cache'):
+            jobs = from_cache(jobs, cache, results, journal, args.repeat)
+        archive = Archive(args.archive, args.archive_format, cache) if args.archive else None
+        run_jobs(jobs, dice_path, timeout, args.jobs, results, trials, journal, cache, args.sample_rss, policy, limits, events, archive)
+        if args.predict:
+          table = prediction_error_table(results, modes, args.format)
+          if table:
+            print(table)
+      finally:
+        journal.close()
+        events.emit('sweep done')
+        events.close()
 
       print()
 
-    old_data['results'] = results
-      
-    with open(out, 'w') as f:
-      json.dump(old_data, f, indent=4)
+  if args.reparse:
+    print('========= Reparse =========')
+    archive = Archive(args.archive or '.dice_archive')
+    fields = args.fields or [f for f, _ in list(DICE_SECTIONS.values()) + list(CNF_SECTIONS.values())]
+    with profiler.phase('parse'):
+      parsed, missing = reparse(old_data['results'], archive, fields)
+    save_json(out, old_data)
+    print('Reparsed %d values from %s into %s' % (parsed, archive.path, out))
+    if missing:
+      print('WARNING: %d runs have no archived output' % missing)
+    print()
+
+  store = Store(args.db) if args.db else None
+  if store and args.db_import:
+    for path in args.db_import:
+      print('Importing %s into %s' % (path, args.db))
+      store.import_json(load_data(path))
+
+  if store and args.db_export:
+    save_json(args.db_export, store.export_json())
+    print('Exported %s to %s' % (args.db, args.db_export))
 
   if args.table:
     print('========= Table =========')
 
-    if not old_data['results']:
+    if store:
+      old_results = store.results(modes=args.columns)
+    else:
+      old_results = old_data['results']
+
+    if not old_results:
       print('ERRORS: No results to use')
       exit(2)
-    
-    old_results = old_data['results']
 
-    table = Template("""\\begin{table}[h]
-\\caption{$caption}
-\\begin{tabular}{$alignments}
-\\toprule
-Benchmarks & $columns \\\\
-\\midrule
-$rows
-\\bottomrule
-\\end{tabular}
-\\end{table}""")
+    modes = args.columns or present_modes(old_results)
+    for warning in comparability(old_results, modes):
+      print('WARNING:', warning)
 
+    files = sorted(old_results.keys())
     for f in Fields:
-      modes = args.columns or Modes
-      columns = " & ".join(map(Modes.to_column, modes))
-      alignments = 'l' + 'r' * len(modes)
-      rows = []
-      max_col_vals = {}
-
-      make_table = True
-      for filename in old_results.keys():
-        if not f in old_results[filename]:
-          make_table = False
+      header = ['Benchmarks'] + list(map(Modes.to_column, modes))
+
+      # files without any value for the field, e.g. when read from --db, show up as '-'
+      make_table = any(f in old_results[filename] for filename in files)
       
       if make_table:
-        for filename in sorted(old_results.keys()):
-          cols = []
-        
-          for m in modes:
-            if m in old_results[filename][f] and old_results[filename][f][m]:
-              cols.append(old_results[filename][f][m])
-
-          max_col_vals[filename] = min(cols) if cols else None
-
-        for filename in sorted(old_results.keys()):
-          cols = ['\\textsc{' + filename.split('.')[0].replace('_', '\_') + '}']
-        
-          for m in modes:
-            if f == Fields.TIME:
-              if m in old_results[filename][f] and old_results[filename][f][m] and max_col_vals[filename]:
-                if old_results[filename][f][m] == -1:
-                  cols.append('*')
+        with profiler.phase('table'):
+          values, status = field_matrix(old_results, f, modes, files)
+          best = np.round(row_min(values), 2)
+          bold = set(zip(*np.nonzero(np.round(values, 2) == best[:, None])))
+          bold = {(i, j + 1) for i, j in bold}
+
+          rows = []
+          for i, filename in enumerate(files):
+            cols = [filename.split('.')[0]]
+            for j in range(len(modes)):
+              if status[i, j] == TIMED_OUT:
+                cols.append('TO')
+              elif status[i, j] == OUT_OF_MEMORY:
+                cols.append('MO')
+              elif status[i, j] == CPU_LIMITED:
+                cols.append('CO')
+              elif status[i, j] == FAILED:
+                cols.append('*')
+              elif status[i, j] == SOLVED:
+                if f in SECONDS_FIELDS:
+                  cols.append('%.2f' % values[i, j])
                 else:
-                  if round(old_results[filename][f][m], 2) == round(max_col_vals[filename], 2):
-                    cols.append('\\textbf{%.2f}' % old_results[filename][f][m])
-                  else:
-                    cols.append('%.2f' % old_results[filename][f][m])
-              else:
-                cols.append('-')
-            else:
-              if m in old_results[filename][f] and old_results[filename][f][m] and max_col_vals[filename]:
-                if old_results[filename][f][m] == -1:
-                  cols.append('*')
-                else:
-                  if round(old_results[filename][f][m], 2) == round(max_col_vals[filename], 2):
-                    cols.append('\\textbf{%s}' % "{:,}".format(old_results[filename][f][m]))
-                  else:
-                    cols.append("{:,}".format(old_results[filename][f][m]))
+                  cols.append("{:,}".format(int(values[i, j])))
               else:
                 cols.append('-')
+            rows.append(cols)
 
-          rows.append(' & '.join(cols) + ' \\\\')
-      
-        rows = '\n'.join(rows)
+          caption = '%s Results' % str(f).capitalize()
+          print(render_table(caption, header, rows, args.format, bold))
 
-        caption = '%s Results' % str(f).capitalize()
-        print(table.substitute(caption=caption, alignments=alignments, columns=columns, rows=rows))
-    
+  if args.analytics:
+    print('========= Analytics =========')
 
-  if args.plot:
-    print('========= Plot =========')
+    if store:
+      old_results = store.results(modes=args.columns)
+      timeouts = store.timeouts()
+    else:
+      old_results = old_data['results']
+      timeouts = old_data.get('timeouts', {})
 
-    if not old_data['results']:
+    if not old_results:
       print('ERRORS: No results to use')
       exit(2)
-    
-    old_results = old_data['results']
-
-    colors = [
-      'tab:blue', 
-      'tab:orange', 
-      'tab:green', 
-      'tab:red', 
-      'tab:purple', 
-      'tab:brown', 
-      'tab:pink', 
-      'tab:gray', 
-      'tab:olive'
-    ]
-
-    modes = args.columns or Modes
-
-    # time cactus plot
-    labels = ['Original', 'With Local Flip-Hoisting']
-    for m, color, label in zip(modes, colors, labels):
-      y_data = []
-      y_timeouts = []
-      for filename in old_results.keys():
-        if m in old_results[filename][Fields.TIME] and old_results[filename][Fields.TIME][m]:
-          # y_data.append(old_results[filename][Fields.TIME][m])
-          y_data.append(math.log(old_results[filename][Fields.TIME][m]))
-        else:
-          # y_timeouts.append(old_data['timeouts'][m])
-          y_timeouts.append(math.log(old_data['timeouts'][m]))
 
-      y_data.sort()
-
-      y_timeouts = y_data[-1:] + y_timeouts
-
-      x_data = [x for x in range(len(y_data))]
-      x_timeouts = [x + len(x_data) - 1 for x in range(len(y_timeouts))]
-
-      plt.plot(x_data, y_data, 'o-', color=color, label=label)
-      plt.plot(x_timeouts, y_timeouts, 'x-', color=color)
-
-    plt.xlabel('Benchmarks')
-    # plt.ylabel('Time (s)')
-    plt.ylabel('Time (log s)')
-    plt.legend()
-
-    plt.grid(True, ls=':')
+    modes = args.columns or present_modes(old_results)
+    for warning in comparability(old_results, modes):
+      print('WARNING:', warning)
+    for f in Fields:
+      if any(f in r for r in old_results.values()):
+        with profiler.phase('analytics'):
+          table = analytics_table(old_results, timeouts, f, modes, args.baseline, args.format)
+        if table:
+          print(table)
+    
+  if args.fit:
+    print('========= Growth =========')
 
-    plot_name = 'time_cactus.png'
+    if store:
+      old_results = store.results(modes=args.columns)
+    else:
+      old_results = old_data['results']
 
-    plt.savefig(plot_name, bbox_inches='tight')
-    print('Saved to %s' % plot_name)
+    modes = args.columns or present_modes(old_results)
+    fields = args.fields or [Fields.TIME, Fields.SIZE, Fields.CALLS]
+    table = growth_table(old_results, fields, modes, args.format)
+    if table:
+      print(table)
+    else:
+      print('ERRORS: No results of generated programs to fit')
 
-    # size plot
-    plt.figure(figsize=(20,15))
-    width = 0.4
-    files = sorted(old_results.keys())
-    x_data = [x for x in range(len(files))]
-
-    for m, color, label in zip(modes, colors, labels):
-      y_data = []
-      y_timeouts = []
-      for filename in files:
-        if m in old_results[filename][Fields.SIZE] and old_results[filename][Fields.SIZE][m] \
-          and old_results[filename][Fields.SIZE][m] != -1:
-          # y_data.append(old_results[filename][Fields.SIZE][m])
-          y_data.append(math.log(old_results[filename][Fields.SIZE][m], 10))
-        else:
-          y_data.append(0)
+  if args.plot:
+    print('========= Plot =========')
 
-      plt.bar(x_data, y_data, color=color, width=width, label=label)
-      x_data = [x+width for x in x_data]
-      # plt.plot(x_timeouts, y_timeouts, 'x-', color=color)
+    if store:
+      old_results = store.results([Fields.TIME, Fields.SIZE], args.columns)
+      old_data['timeouts'] = store.timeouts()
+    else:
+      old_results = old_data['results']
 
-    labels = [f.split('.')[0] for f in files]
-    half_width = (x_data[0] - width) / 2
-    x_data = [x-width-half_width for x in x_data]
-    plt.xticks(x_data, labels, rotation=-45, ha="left", rotation_mode="anchor")
-    plt.xlabel('Benchmarks')
-    # plt.ylabel('BDD Size')
-    plt.ylabel('BDD Size (log10)')
-    plt.legend()
+    if not old_results:
+      print('ERRORS: No results to use')
+      exit(2)
 
-    plt.grid(True, ls=':')
+    modes = args.columns or present_modes(old_results)
+    labels = args.labels or list(map(Modes.to_column, modes))
+    if len(labels) != len(modes):
+      print('ERRORS: --labels needs one label per column')
+      exit(2)
 
-    plot_name = 'size_cactus.png'
+    timeouts = {m: old_data['timeouts'].get(m) for m in modes}
+    figures = [(plot_time_cactus, (old_results, timeouts, modes, labels, 'time_cactus.png'))]
+    if any(Fields.SIZE in r for r in old_results.values()):
+      figures.append((plot_size_bars, (old_results, modes, labels, 'size_cactus.png')))
 
-    plt.savefig(plot_name, bbox_inches='tight')
-    print('Saved to %s' % plot_name)
+    with profiler.phase('plot'):
+      plot_names = render_plots(figures, args.jobs)
+    for plot_name in plot_names:
+      print('Saved to %s' % plot_name)
 
     # time to flips 
     # plt.figure()
@@ -710,5 +3087,19 @@ $rows
     # plt.savefig(plot_name, bbox_inches='tight')
     # print('Saved to %s' % plot_name)
 
+  if args.overhead:
+    print('========= Overhead =========')
+
+    modes = args.columns or present_modes(old_data['results'])
+    table = overhead_table(old_data['results'], modes, args.format)
+    if table:
+      print(table)
+    else:
+      print('ERRORS: No timed runs to break down')
+
+  if args.profile:
+    print('========= Profile =========')
+    print(render_table('Harness Profile (s)', ['Phase', 'Calls', 'Seconds', 'Share %'], profiler.rows(), args.format))
+
 if __name__ == '__main__':
   main()